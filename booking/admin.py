@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booking, Payment, CancellationPolicy, Amenity, BookingAmenity
+from .models import Booking, Payment, CancellationPolicy, Amenity, BookingAmenity, RoomNight
 
 
 @admin.register(Booking)
@@ -61,3 +61,11 @@ class BookingAmenityAdmin(admin.ModelAdmin):
     list_display = ['booking', 'amenity', 'price']
     list_filter = ['amenity']
     search_fields = ['booking__booking_id', 'amenity__name']
+
+
+@admin.register(RoomNight)
+class RoomNightAdmin(admin.ModelAdmin):
+    list_display = ['room', 'date', 'state', 'booking']
+    list_filter = ['state', 'room__hotel', 'date']
+    search_fields = ['room__room_number', 'booking__booking_id']
+    raw_id_fields = ['room', 'booking']
@@ -0,0 +1,287 @@
+"""
+Automatic room assignment
+Books by RoomType and picks the physical room with a best-fit interval
+packing heuristic: stays are placed where they leave the fewest unsellable
+gaps (shorter than MIN_SELLABLE_NIGHTS) in a room's calendar. The same packer
+re-shuffles auto-assigned future bookings in the nightly
+optimize_room_assignments run.
+"""
+
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import chain
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from hotel.models import Room
+from .models import Booking, RoomNight
+from .inventory import booked_nights, release_expired_holds, room_nights_changed, to_date
+
+
+# Gaps shorter than this cannot be sold and count as fragmentation
+MIN_SELLABLE_NIGHTS = 2
+# Cost of leaving one unsellable gap next to a stay
+ORPHAN_PENALTY = 1000
+# How far around a stay we look for neighbouring bookings
+LOOKAROUND_DAYS = 60
+
+
+def gap_cost(gap):
+    """
+    (penalty, slack) of the free gap a stay leaves on one side; None means no
+    neighbouring stay in sight. Abutting a stay is free, an orphan gap is
+    heavily penalised, and among sellable gaps the tightest wins (best fit).
+    """
+    if gap == 0:
+        return 0, 0
+    if gap is None:
+        return 1, LOOKAROUND_DAYS
+    if gap < MIN_SELLABLE_NIGHTS:
+        return ORPHAN_PENALTY, 0
+    return 1, gap
+
+
+class RoomCalendar:
+    """Occupied intervals [start, end) of one room, as sorted day ordinals"""
+    __slots__ = ('room_id', 'starts', 'ends')
+
+    def __init__(self, room_id):
+        self.room_id = room_id
+        self.starts = []
+        self.ends = []
+
+    def add(self, start, end):
+        index = bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+
+    def gaps(self, start, end):
+        """
+        Free nights left before and after [start, end) if it fits, else None.
+        A side without a neighbouring stay reports None.
+        """
+        index = bisect_right(self.starts, start)
+        if index and self.ends[index - 1] > start:
+            return None
+        if index < len(self.starts) and self.starts[index] < end:
+            return None
+        left = start - self.ends[index - 1] if index else None
+        right = self.starts[index] - end if index < len(self.starts) else None
+        return left, right
+
+    def cost(self, start, end):
+        gaps = self.gaps(start, end)
+        if gaps is None:
+            return None
+        left, right = gap_cost(gaps[0]), gap_cost(gaps[1])
+        return left[0] + right[0], left[1] + right[1]
+
+    def orphan_nights(self):
+        """Nights stuck in gaps too short to sell"""
+        return sum(
+            gap for gap in (self.starts[i] - self.ends[i - 1] for i in range(1, len(self.starts)))
+            if 0 < gap < MIN_SELLABLE_NIGHTS
+        )
+
+
+class RoomPlanner:
+    """
+    Calendars of interchangeable rooms, indexed by the days their free
+    stretches begin and end on, so the rooms a new stay can abut are found
+    without a full scan.
+    """
+
+    def __init__(self, room_ids):
+        self.calendars = {room_id: RoomCalendar(room_id) for room_id in room_ids}
+        # day -> rooms whose free stretch starts (free_from) or ends (free_until) there
+        self.free_from = defaultdict(set)
+        self.free_until = defaultdict(set)
+
+    def add(self, room_id, start, end):
+        calendar = self.calendars[room_id]
+        calendar.add(start, end)
+        if start in calendar.ends:
+            self.free_from[start].discard(room_id)
+        else:
+            self.free_until[start].add(room_id)
+        if end in calendar.starts:
+            self.free_until[end].discard(room_id)
+        else:
+            self.free_from[end].add(room_id)
+
+    def _cheapest(self, room_ids, start, end):
+        best_cost, best_id = None, None
+        for room_id in room_ids:
+            cost = self.calendars[room_id].cost(start, end)
+            if cost is not None and (best_cost is None or (cost, room_id) < (best_cost, best_id)):
+                best_cost, best_id = cost, room_id
+        return best_cost, best_id
+
+    def best_room(self, start, end):
+        """
+        Id of the room for [start, end), or None if every room is taken.
+        Rooms the stay would abut are tried first, then rooms leaving ever
+        wider sellable gaps (best fit); all rooms are scanned only when none
+        of those fits without creating an orphan gap.
+        """
+        # A stay filling a free stretch exactly cannot be beaten
+        for room_id in sorted(self.free_from.get(start, set()) & self.free_until.get(end, set())):
+            if self.calendars[room_id].gaps(start, end) is not None:
+                return room_id
+
+        for gap in chain([0], range(MIN_SELLABLE_NIGHTS, LOOKAROUND_DAYS)):
+            candidates = self.free_from.get(start - gap, set()) | self.free_until.get(end + gap, set())
+            if candidates:
+                cost, room_id = self._cheapest(candidates, start, end)
+                if cost is not None and cost[0] < ORPHAN_PENALTY:
+                    return room_id
+        return self._cheapest(self.calendars, start, end)[1]
+
+    def pack(self, stays):
+        """
+        Place stays (key, start, end) around the stays already added, earliest
+        check-in first. Returns {key: room_id}, or None if some stay does not fit.
+        """
+        assignment = {}
+        for key, start, end in sorted(stays, key=lambda stay: (stay[1], stay[1] - stay[2])):
+            room_id = self.best_room(start, end)
+            if room_id is None:
+                return None
+            self.add(room_id, start, end)
+            assignment[key] = room_id
+        return assignment
+
+    def orphan_nights(self):
+        return sum(calendar.orphan_nights() for calendar in self.calendars.values())
+
+
+def planner_from_nights(room_ids, nights):
+    """Build a planner from (room_id, date) rows, merging consecutive nights"""
+    by_room = defaultdict(list)
+    for room_id, night in nights:
+        by_room[room_id].append(night.toordinal())
+
+    planner = RoomPlanner(room_ids)
+    for room_id, days in by_room.items():
+        days.sort()
+        run_start = days[0]
+        for i, day in enumerate(days):
+            if i + 1 == len(days) or days[i + 1] != day + 1:
+                planner.add(room_id, run_start, day + 1)
+                if i + 1 < len(days):
+                    run_start = days[i + 1]
+    return planner
+
+
+def bookable_rooms(room_type=None):
+    """Active rooms that are not out of service, of one room type or of any"""
+    rooms = Room.objects.all() if room_type is None else room_type.rooms.all()
+    return rooms.filter(is_active=True).exclude(status__in=['maintenance', 'unavailable'])
+
+
+def assign_room(room_type, check_in, check_out, exclude_ids=()):
+    """
+    Choose the physical room of room_type for a new stay: two queries (rooms
+    and the room nights around the stay). Returns a Room, or None if every
+    room of the type is taken.
+    """
+    check_in, check_out = to_date(check_in), to_date(check_out)
+    rooms = {room.id: room for room in bookable_rooms(room_type).exclude(id__in=exclude_ids).select_related('room_type')}
+    if not rooms:
+        return None
+
+    nights = booked_nights(
+        check_in - timedelta(days=LOOKAROUND_DAYS),
+        check_out + timedelta(days=LOOKAROUND_DAYS),
+        room_id__in=list(rooms),
+    ).values_list('room_id', 'date')
+
+    planner = planner_from_nights(sorted(rooms), nights)
+    room_id = planner.best_room(check_in.toordinal(), check_out.toordinal())
+    return rooms[room_id] if room_id else None
+
+
+def reoptimize_room_type(room_type, start=None, dry_run=False):
+    """
+    Re-pack the auto-assigned future bookings of one room type around every
+    other stay. Changes are applied only when they reduce orphan nights.
+    Returns a dict with moved bookings and orphan nights before and after
+    (what would change, with dry_run).
+    """
+    start = start or timezone.now().date() + timedelta(days=1)
+    result = {'room_type': room_type.name, 'moved': 0, 'orphans_before': 0, 'orphans_after': 0}
+
+    with transaction.atomic():
+        # Lock the rooms so reservations wait until the reshuffle is written
+        room_ids = list(
+            Room.objects.select_for_update()
+            .filter(id__in=bookable_rooms(room_type).values('id'))
+            .order_by('id').values_list('id', flat=True)
+        )
+        if not room_ids:
+            return result
+
+        nights = list(
+            booked_nights(start, start + timedelta(days=3650), room_id__in=room_ids)
+            .values_list('room_id', 'date', 'booking_id', 'state', 'expires_at')
+        )
+        movable = {
+            booking.id: booking
+            for booking in Booking.objects.filter(
+                auto_assigned=True,
+                room_id__in=room_ids,
+                check_in_date__gte=start,
+                id__in={night[2] for night in nights},
+            )
+        }
+
+        result['orphans_before'] = planner_from_nights(
+            room_ids, [(room_id, day) for room_id, day, *_ in nights]
+        ).orphan_nights()
+
+        planner = planner_from_nights(
+            room_ids, [(room_id, day) for room_id, day, booking_id, *_ in nights if booking_id not in movable]
+        )
+        assignment = planner.pack(
+            (booking.id, booking.check_in_date.toordinal(), booking.check_out_date.toordinal())
+            for booking in movable.values()
+        )
+        if assignment is None:
+            result['orphans_after'] = result['orphans_before']
+            return result
+
+        orphans_after = planner.orphan_nights()
+        moved = [booking for booking in movable.values() if assignment[booking.id] != booking.room_id]
+        if not moved or orphans_after >= result['orphans_before']:
+            result['orphans_after'] = result['orphans_before']
+            return result
+
+        result.update(moved=len(moved), orphans_after=orphans_after)
+        if dry_run:
+            return result
+
+        # Lapsed holds do not block the plan but still occupy their (room, date)
+        # slot until swept; drop them so moved bookings can take those nights
+        release_expired_holds(room_id__in=room_ids)
+
+        night_meta = {booking_id: (state, expires_at) for _, _, booking_id, state, expires_at in nights}
+        RoomNight.objects.filter(booking__in=moved).delete()
+        new_nights = []
+        for booking in moved:
+            booking.room_id = assignment[booking.id]
+            state, expires_at = night_meta[booking.id]
+            day = booking.check_in_date
+            while day < booking.check_out_date:
+                new_nights.append(RoomNight(
+                    room_id=booking.room_id, date=day, booking=booking, state=state, expires_at=expires_at
+                ))
+                day += timedelta(days=1)
+        Booking.objects.bulk_update(moved, ['room'])
+        RoomNight.objects.bulk_create(new_nights)
+
+    first = min(booking.check_in_date for booking in moved)
+    last = max(booking.check_out_date for booking in moved)
+    room_nights_changed.send(sender=Booking, hotel_id=room_type.hotel_id, stays=[(first, last)])
+    return result
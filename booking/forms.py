@@ -3,7 +3,11 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
 from .models import Booking, Payment
+from .inventory import available_room_ids
+from .assignment import bookable_rooms
+from .guests import MIN_PREFIX_LENGTH, normalize_email, normalize_phone
 from hotel.models import Room
+from hotel.pricing import quote_rooms
 
 class BookingForm(forms.ModelForm):
     """Form for creating room bookings"""
@@ -44,11 +48,12 @@ class BookingForm(forms.ModelForm):
             }),
         }
     
-    def __init__(self, room=None, *args, **kwargs):
+    def __init__(self, room=None, room_type=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.room = room
-        if room:
-            self.fields['number_of_guests'].max_value = room.room_type.max_guests
+        self.room_type = room_type or (room.room_type if room else None)
+        if self.room_type:
+            self.fields['number_of_guests'].max_value = self.room_type.max_guests
     
     def clean(self):
         cleaned_data = super().clean()
@@ -66,15 +71,71 @@ class BookingForm(forms.ModelForm):
                 raise ValidationError("Check-in date must be at least tomorrow.")
         
         # Validate guest count
-        if self.room and guests and guests > self.room.room_type.max_guests:
+        if self.room_type and guests and guests > self.room_type.max_guests:
             raise ValidationError(
-                f"Maximum guests for this room type is {self.room.room_type.max_guests}."
+                f"Maximum guests for this room type is {self.room_type.max_guests}."
             )
         
         # Check room availability
         if self.room and check_in and check_out:
-            if not self.room.is_available(check_in, check_out):
+            if not available_room_ids(check_in, check_out, room_ids=[self.room.id]):
                 raise ValidationError("This room is not available for selected dates.")
+            self.check_min_stay([self.room], check_in, check_out)
+        elif self.room_type and check_in and check_out:
+            room_ids = bookable_rooms(self.room_type).values_list('id', flat=True)
+            free_ids = available_room_ids(check_in, check_out, room_ids=room_ids)
+            if not free_ids:
+                raise ValidationError("No rooms of this type are available for selected dates.")
+            self.check_min_stay(Room.objects.filter(id__in=free_ids), check_in, check_out)
+        
+        return cleaned_data
+    
+    def check_min_stay(self, rooms, check_in, check_out):
+        """At least one of the rooms must accept a stay this long on the arrival date"""
+        quotes = quote_rooms(rooms, check_in, check_out).values()
+        if quotes and not any(quote.meets_min_stay for quote in quotes):
+            min_stay = min(quote.min_stay for quote in quotes)
+            raise ValidationError(f"Stays arriving on this date require at least {min_stay} nights.")
+
+
+class GroupBookingForm(forms.Form):
+    """Form for booking several rooms for one group at the front desk"""
+    check_in_date = forms.DateField()
+    check_out_date = forms.DateField()
+    guests = forms.IntegerField(min_value=1)
+    rooms = forms.ModelMultipleChoiceField(
+        queryset=bookable_rooms().filter(room_type__isnull=False).select_related('room_type'),
+        required=False,
+        help_text="Rooms from a group search; allocated automatically when empty"
+    )
+    rooms_needed = forms.IntegerField(min_value=1, max_value=200, required=False)
+    guest_name = forms.CharField(max_length=100)
+    guest_email = forms.EmailField()
+    guest_phone = forms.CharField(max_length=20)
+    special_requests = forms.CharField(required=False, widget=forms.Textarea)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in = cleaned_data.get('check_in_date')
+        check_out = cleaned_data.get('check_out_date')
+        rooms = cleaned_data.get('rooms')
+        rooms_needed = cleaned_data.get('rooms_needed')
+        guests = cleaned_data.get('guests')
+        
+        if check_in and check_out and check_out <= check_in:
+            raise ValidationError("Check-out date must be after check-in date.")
+        
+        if not rooms and not rooms_needed:
+            raise ValidationError("Choose rooms or give the number of rooms needed.")
+        
+        room_count = len(rooms) if rooms else rooms_needed
+        if guests and guests < room_count:
+            raise ValidationError("Every room needs at least one guest.")
+        
+        if rooms:
+            capacity = sum(room.room_type.max_guests for room in rooms if room.room_type)
+            if guests and guests > capacity:
+                raise ValidationError(f"The selected rooms sleep at most {capacity} guests.")
         
         return cleaned_data
 
@@ -182,13 +243,36 @@ class BookingSearchForm(forms.Form):
             'placeholder': 'Booking ID'
         })
     )
-    email = forms.EmailField(
+    email = forms.CharField(
+        max_length=254,
         required=False,
-        widget=forms.EmailInput(attrs={
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Email address or its beginning'
+        })
+    )
+    phone = forms.CharField(
+        max_length=20,
+        required=False,
+        widget=forms.TextInput(attrs={
             'class': 'form-control',
-            'placeholder': 'Email address'
+            'placeholder': 'Phone number or its beginning'
         })
     )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        email = normalize_email(cleaned_data.get('email'))
+        phone = normalize_phone(cleaned_data.get('phone'))
+        
+        if not (cleaned_data.get('booking_id') or email or phone):
+            raise ValidationError("Enter a booking ID, an email or a phone number.")
+        if email and len(email) < MIN_PREFIX_LENGTH:
+            self.add_error('email', f"Enter at least {MIN_PREFIX_LENGTH} characters.")
+        if phone and len(phone) < MIN_PREFIX_LENGTH:
+            self.add_error('phone', f"Enter at least {MIN_PREFIX_LENGTH} digits.")
+        
+        return cleaned_data
 
 
 class CancellationForm(forms.Form):
@@ -0,0 +1,64 @@
+"""
+Guest lookup
+Bookings store a lower-cased copy of the guest email and a digits-only copy
+of the guest phone, each indexed together with created_at. A search term
+matches by prefix; the prefix becomes a half-open range on the normalized
+column, so the database seeks the plain B-tree index instead of scanning
+the bookings table.
+
+The range is only exact when the columns compare by code point: SQLite's
+default BINARY collation, "C" on PostgreSQL or a *_bin collation on MySQL.
+Under a linguistic collation (e.g. en_US.UTF-8 or utf8mb4_0900_ai_ci)
+the range can miss or add rows; such a database needs db_collation set on
+guest_email_normalized and guest_phone_normalized.
+"""
+
+import re
+
+from .models import Booking
+
+
+MIN_PREFIX_LENGTH = 3
+SEARCH_PAGE_SIZE = 20
+NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def normalize_phone(phone):
+    """Digits only, so '+880 1700-000000' and '8801700000000' match"""
+    return NON_DIGITS.sub('', phone or '')
+
+
+def prefix_range(field, prefix):
+    """
+    Lookups for values of field starting with prefix, as a >= / < range.
+    Assumes field compares by code point; see the module docstring.
+    """
+    # The smallest string after every string with this prefix
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return {f'{field}__gte': prefix, f'{field}__lt': upper}
+
+
+def guest_bookings(email='', phone=''):
+    """
+    Bookings whose guest email and/or phone start with the given terms,
+    ordered along the matching index. Terms are normalized first; empty
+    terms are ignored.
+    """
+    email = normalize_email(email)
+    phone = normalize_phone(phone)
+
+    bookings = Booking.objects.select_related('room', 'hotel')
+    if email:
+        bookings = bookings.filter(**prefix_range('guest_email_normalized', email))
+        ordering = ('guest_email_normalized', '-created_at', '-id')
+    if phone:
+        bookings = bookings.filter(**prefix_range('guest_phone_normalized', phone))
+        if not email:
+            ordering = ('guest_phone_normalized', '-created_at', '-id')
+    if not (email or phone):
+        return Booking.objects.none()
+    return bookings.order_by(*ordering)
@@ -0,0 +1,403 @@
+"""
+Room-night inventory
+Keeps one RoomNight row per room per blocked night so availability checks
+become an indexed range scan instead of an overlap query on Booking.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Max, Q, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from hotel.models import Room
+from hotel.pricing import quote_stays
+from .models import Booking, RoomNight
+from .stats import invalidate_booking_stats
+
+
+# Booking status -> state of the room nights it blocks
+NIGHT_STATES = {
+    'pending': 'held',
+    'confirmed': 'booked',
+    'checked_in': 'occupied',
+}
+
+# Sent after a booking's room nights are rewritten and committed.
+# kwargs: hotel_id, stays=[(check_in, check_out), ...] covering old and new nights
+room_nights_changed = Signal()
+
+
+def send_nights_changed(sender, hotel_id, stays):
+    """
+    Send room_nights_changed once the current transaction commits, so no
+    reader caches the old availability under the stamps its listeners bump.
+    """
+    transaction.on_commit(partial(room_nights_changed.send, sender=sender, hotel_id=hotel_id, stays=stays))
+
+
+class RoomUnavailable(Exception):
+    """Raised when a booking's nights are already held by another booking"""
+
+
+def to_date(value):
+    """Accept a date or an ISO 'YYYY-MM-DD' string"""
+    if isinstance(value, date):
+        return value
+    parsed = parse_date(str(value))
+    if parsed is None:
+        raise ValueError(f"Invalid date: {value}")
+    return parsed
+
+
+def parse_range(value):
+    """(check_in, check_out) from a 'YYYY-MM-DD:YYYY-MM-DD' string"""
+    try:
+        check_in, check_out = str(value).split(':')
+    except ValueError:
+        raise ValueError(f"Invalid range: {value}")
+    check_in, check_out = to_date(check_in), to_date(check_out)
+    if check_out <= check_in:
+        raise ValueError(f"Invalid range: {value}")
+    return check_in, check_out
+
+
+def requested_ranges(params, limit=None):
+    """
+    Stays asked for in query parameters: check_in/check_out first, then each
+    repeatable range=YYYY-MM-DD:YYYY-MM-DD. Raises ValueError if one is
+    invalid or there are more than limit.
+    """
+    ranges = []
+    if params.get('check_in') and params.get('check_out'):
+        ranges.append(parse_range(f"{params['check_in']}:{params['check_out']}"))
+    ranges += [parse_range(raw) for raw in params.getlist('range')]
+    if limit is not None and len(ranges) > limit:
+        raise ValueError(f"At most {limit} ranges")
+    return ranges
+
+
+def stay_dates(check_in, check_out):
+    """Every night of a stay (check-out day excluded)"""
+    check_in = to_date(check_in)
+    check_out = to_date(check_out)
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+
+def hold_expiry(state):
+    """Held nights lapse after BOOKING_HOLD_MINUTES; every other state is permanent"""
+    if state == 'held':
+        return timezone.now() + timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+    return None
+
+
+def sync_room_nights(booking, previous_state=None):
+    """
+    Rewrite the room nights held by a booking to match its current state.
+    previous_state is the booking's former get_inventory_state(), used to
+    tell listeners which nights were released.
+    Raises RoomUnavailable if another booking already holds one of the nights.
+    """
+    state = NIGHT_STATES.get(booking.status)
+    current_state = booking.get_inventory_state()
+
+    # Same room and dates, only the night state moves (e.g. held -> booked)
+    if previous_state is not None and current_state is not None and previous_state[:3] == current_state[:3]:
+        updated = RoomNight.objects.filter(booking=booking).update(
+            state=state, expires_at=hold_expiry(state)
+        )
+        if updated == len(stay_dates(booking.check_in_date, booking.check_out_date)):
+            return updated
+        # Some nights were never claimed or have been released: claim them afresh
+
+    stays = []
+    if previous_state is not None:
+        stays.append((to_date(previous_state[1]), to_date(previous_state[2])))
+
+    nights = []
+    try:
+        with transaction.atomic():
+            RoomNight.objects.filter(booking=booking).delete()
+            if state is not None:
+                # Lapsed holds the sweeper has not reached yet must not block the claim
+                RoomNight.objects.filter(
+                    room_id=booking.room_id,
+                    date__gte=to_date(booking.check_in_date),
+                    date__lt=to_date(booking.check_out_date),
+                    expires_at__lte=timezone.now(),
+                ).delete()
+                expires_at = hold_expiry(state)
+                nights = [
+                    RoomNight(
+                        room_id=booking.room_id, date=night, booking=booking,
+                        state=state, expires_at=expires_at,
+                    )
+                    for night in stay_dates(booking.check_in_date, booking.check_out_date)
+                ]
+                RoomNight.objects.bulk_create(nights)
+                stays.append((to_date(booking.check_in_date), to_date(booking.check_out_date)))
+    except IntegrityError:
+        raise RoomUnavailable(f"Room {booking.room_id} is already booked for some of these nights.")
+
+    send_nights_changed(Booking, booking.hotel_id, stays)
+    return len(nights)
+
+
+def reserve_room(booking):
+    """
+    Check availability and insert a new booking as one atomic step.
+
+    The room row is locked for the duration, so concurrent reservations of
+    the same room queue up while other rooms proceed; the unique (room, date)
+    constraint on RoomNight backs this up on databases without row locks.
+    Raises RoomUnavailable if any night of the stay is taken.
+    """
+    adding = booking._state.adding
+    try:
+        with transaction.atomic():
+            list(Room.objects.select_for_update().filter(pk=booking.room_id).values_list('id', flat=True))
+            if booked_nights(booking.check_in_date, booking.check_out_date, room_id=booking.room_id).exists():
+                raise RoomUnavailable("This room is not available for selected dates.")
+            booking.save()
+    except RoomUnavailable:
+        if adding:
+            # The insert was rolled back; let the caller retry with another room
+            booking.pk = None
+            booking._state.adding = True
+        raise
+    return booking
+
+
+def reserve_rooms(bookings):
+    """
+    Insert a group of new bookings and claim all their nights in one
+    transaction using bulk_create. Rooms are locked in id order so two group
+    reservations cannot deadlock. Raises RoomUnavailable, writing nothing,
+    if any night is taken.
+    """
+    room_ids = sorted({booking.room_id for booking in bookings})
+    ranges = sorted({(to_date(b.check_in_date), to_date(b.check_out_date)) for b in bookings})
+    range_index = {stay: i for i, stay in enumerate(ranges)}
+
+    with transaction.atomic():
+        list(Room.objects.select_for_update().filter(pk__in=room_ids).order_by('pk').values_list('id', flat=True))
+
+        availability = availability_matrix(ranges, room_ids=room_ids)
+        for booking in bookings:
+            stay = (to_date(booking.check_in_date), to_date(booking.check_out_date))
+            if not availability[booking.room_id][range_index[stay]]:
+                raise RoomUnavailable(f"Room {booking.room_id} is not available for selected dates.")
+
+        # Price every stay with one rate query instead of one per booking
+        unpriced = [booking for booking in bookings if booking.room_price_per_night is None]
+        for booking, quote in zip(unpriced, quote_stays(
+            (booking.room, to_date(booking.check_in_date), to_date(booking.check_out_date)) for booking in unpriced
+        )):
+            booking.apply_quote(quote)
+        for booking in bookings:
+            booking.fill_derived_fields()
+        Booking.objects.bulk_create(bookings)
+
+        nights = []
+        for booking in bookings:
+            state = NIGHT_STATES[booking.status]
+            expires_at = hold_expiry(state)
+            nights.extend(
+                RoomNight(room_id=booking.room_id, date=night, booking=booking, state=state, expires_at=expires_at)
+                for night in stay_dates(booking.check_in_date, booking.check_out_date)
+            )
+        try:
+            with transaction.atomic():
+                RoomNight.objects.bulk_create(nights)
+        except IntegrityError:
+            raise RoomUnavailable("Some of these rooms were booked for the selected dates.")
+
+    for booking in bookings:
+        booking._inventory_state = booking.get_inventory_state()
+
+    stays_by_hotel = defaultdict(set)
+    for booking in bookings:
+        stays_by_hotel[booking.hotel_id].add((to_date(booking.check_in_date), to_date(booking.check_out_date)))
+    for hotel_id, stays in stays_by_hotel.items():
+        send_nights_changed(Booking, hotel_id, sorted(stays))
+    # bulk_create skips post_save; bump after commit like the signal does
+    transaction.on_commit(partial(invalidate_booking_stats, *{booking.user_id for booking in bookings}))
+
+    return bookings
+
+
+def refresh_hold(booking):
+    """
+    Restart the hold timer of a pending booking that enters payment.
+    A lapsed hold is claimed again; raises RoomUnavailable if another guest
+    took the nights in the meantime. Returns the new expiry, or None if the
+    booking is not pending.
+    """
+    if booking.status != 'pending':
+        return None
+
+    expires_at = hold_expiry('held')
+    with transaction.atomic():
+        updated = RoomNight.objects.filter(booking=booking).update(expires_at=expires_at)
+        if updated != len(stay_dates(booking.check_in_date, booking.check_out_date)):
+            sync_room_nights(booking)
+            expires_at = booking.nights.values_list('expires_at', flat=True).first()
+    return expires_at
+
+
+def release_expired_holds(batch_size=1000, **filters):
+    """
+    Delete lapsed holds in batches, optionally only those matching filters
+    (e.g. room_id__in=...). Only the partial index on RoomNight.expires_at
+    is walked; the bookings table is never scanned.
+    Returns the number of nights released.
+    """
+    now = timezone.now()
+    released = 0
+
+    while True:
+        batch = list(
+            RoomNight.objects.filter(expires_at__lte=now, **filters)
+            .order_by('expires_at')
+            .values_list('id', 'room__hotel_id', 'date')[:batch_size]
+        )
+        if not batch:
+            break
+
+        # Re-check expiry so a hold refreshed since the select survives
+        released += RoomNight.objects.filter(
+            id__in=[night_id for night_id, _, _ in batch], expires_at__lte=now
+        ).delete()[0]
+
+        spans = {}
+        for _, hotel_id, night in batch:
+            first, last = spans.get(hotel_id, (night, night))
+            spans[hotel_id] = (min(first, night), max(last, night))
+        for hotel_id, (first, last) in spans.items():
+            send_nights_changed(RoomNight, hotel_id, [(first, last + timedelta(days=1))])
+
+        if len(batch) < batch_size:
+            break
+
+    return released
+
+
+def booked_nights(check_in, check_out, **filters):
+    """RoomNight rows blocking [check_in, check_out); lapsed holds do not count"""
+    return RoomNight.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+        date__gte=to_date(check_in),
+        date__lt=to_date(check_out),
+        **filters
+    )
+
+
+def is_room_available(room, check_in, check_out):
+    """Check if a single room has no blocked nights in the date range"""
+    return not booked_nights(check_in, check_out, room=room).exists()
+
+
+def availability_matrix(date_ranges, room_ids=None, hotel=None):
+    """
+    Resolve availability for many rooms x many date ranges in a constant
+    number of queries: one range scan over RoomNight, plus one query for the
+    room ids when a whole hotel is requested.
+
+    Returns {room_id: [bool, ...]} with one flag per entry of date_ranges.
+    """
+    ranges = [(to_date(check_in), to_date(check_out)) for check_in, check_out in date_ranges]
+
+    if room_ids is None:
+        if hotel is None:
+            raise ValueError("Pass either room_ids or hotel")
+        room_ids = hotel.rooms.values_list('id', flat=True)
+    room_ids = list(room_ids)
+
+    if not ranges or not room_ids:
+        return {room_id: [True] * len(ranges) for room_id in room_ids}
+
+    start = min(check_in for check_in, _ in ranges)
+    end = max(check_out for _, check_out in ranges)
+
+    nights = defaultdict(list)
+    rows = booked_nights(start, end, room_id__in=room_ids).order_by('room_id', 'date')
+    for room_id, night in rows.values_list('room_id', 'date'):
+        nights[room_id].append(night)
+
+    matrix = {}
+    for room_id in room_ids:
+        dates = nights.get(room_id)
+        if not dates:
+            matrix[room_id] = [True] * len(ranges)
+            continue
+        # A range is free when no blocked night falls inside [check_in, check_out)
+        matrix[room_id] = [
+            bisect_left(dates, check_in) == bisect_left(dates, check_out)
+            for check_in, check_out in ranges
+        ]
+    return matrix
+
+
+def available_room_ids(check_in, check_out, room_ids=None, hotel=None):
+    """Ids of rooms free for the whole stay"""
+    matrix = availability_matrix([(check_in, check_out)], room_ids=room_ids, hotel=hotel)
+    return [room_id for room_id, flags in matrix.items() if flags[0]]
+
+
+def rebuild_room_nights(bookings=None, batch_size=1000):
+    """
+    Rebuild inventory rows from scratch for the given bookings (default: all).
+    Stays in progress and confirmed bookings claim their nights first; a
+    pending booking that collides with them is left without nights.
+    Pending bookings get held nights that lapse at their hold deadline: the
+    later of their current hold and BOOKING_HOLD_MINUTES after creation.
+    Pending bookings past that deadline get no nights.
+    Returns the number of room nights written.
+    """
+    if bookings is None:
+        bookings = Booking.objects.all()
+
+    now = timezone.now()
+    hold = timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+    held_until = dict(
+        RoomNight.objects.filter(booking__in=bookings, expires_at__isnull=False)
+        .values('booking_id').annotate(deadline=Max('expires_at')).values_list('booking_id', 'deadline')
+    )
+    RoomNight.objects.filter(booking__in=bookings).delete()
+
+    blocking = bookings.filter(status__in=NIGHT_STATES).annotate(
+        precedence=Case(
+            When(status='checked_in', then=Value(0)),
+            When(status='confirmed', then=Value(1)),
+            default=Value(2),
+        )
+    ).order_by('precedence', 'created_at').values_list(
+        'id', 'room_id', 'check_in_date', 'check_out_date', 'status', 'created_at'
+    )
+
+    batch = []
+    for booking_id, room_id, check_in, check_out, status, created_at in blocking.iterator():
+        state = NIGHT_STATES[status]
+        expires_at = None
+        if state == 'held':
+            expires_at = max(filter(None, (held_until.get(booking_id), created_at + hold)))
+            if expires_at <= now:
+                continue
+        for night in stay_dates(check_in, check_out):
+            batch.append(RoomNight(
+                room_id=room_id, date=night, booking_id=booking_id, state=state, expires_at=expires_at
+            ))
+        if len(batch) >= batch_size:
+            RoomNight.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+
+    if batch:
+        RoomNight.objects.bulk_create(batch, ignore_conflicts=True)
+
+    return RoomNight.objects.filter(booking__in=bookings).count()
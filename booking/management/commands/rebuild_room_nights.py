@@ -0,0 +1,28 @@
+"""
+Management command to rebuild the room-night inventory from bookings.
+Usage: python manage.py rebuild_room_nights [--hotel ID]
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from booking.models import Booking
+from booking.inventory import rebuild_room_nights
+
+
+class Command(BaseCommand):
+    help = 'Rebuild RoomNight inventory rows from checked-in, confirmed and unexpired pending bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotel', type=int, help='Only rebuild rooms of this hotel')
+
+    def handle(self, *args, **options):
+        bookings = Booking.objects.all()
+        if options['hotel']:
+            bookings = bookings.filter(hotel_id=options['hotel'])
+
+        with transaction.atomic():
+            written = rebuild_room_nights(bookings)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Rebuilt inventory: {written} room nights')
+        )
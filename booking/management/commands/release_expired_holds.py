@@ -0,0 +1,21 @@
+"""
+Management command to release room nights held by unpaid bookings.
+Run it every minute from cron or a worker loop.
+Usage: python manage.py release_expired_holds [--batch-size N]
+"""
+
+from django.core.management.base import BaseCommand
+from booking.inventory import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Release room-night holds of pending bookings whose payment window has lapsed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Nights deleted per statement')
+
+    def handle(self, *args, **options):
+        released = release_expired_holds(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Released {released} expired room nights')
+        )
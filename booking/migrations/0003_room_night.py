@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+NIGHT_STATES = {
+    'confirmed': 'booked',
+    'checked_in': 'occupied',
+}
+
+
+def backfill_room_nights(apps, schema_editor):
+    """
+    Materialize nights for bookings that already block their room. Pending
+    bookings get none here: holds (held nights with an expiry) arrive in
+    0005, and rebuild_room_nights gives unexpired pending bookings theirs.
+    """
+    Booking = apps.get_model('booking', 'Booking')
+    RoomNight = apps.get_model('booking', 'RoomNight')
+
+    batch = []
+    bookings = Booking.objects.filter(status__in=NIGHT_STATES).values_list(
+        'id', 'room_id', 'check_in_date', 'check_out_date', 'status'
+    )
+    for booking_id, room_id, check_in, check_out, status in bookings.iterator():
+        for offset in range((check_out - check_in).days):
+            batch.append(RoomNight(
+                room_id=room_id,
+                date=check_in + timedelta(days=offset),
+                booking_id=booking_id,
+                state=NIGHT_STATES[status],
+            ))
+        if len(batch) >= 1000:
+            RoomNight.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        RoomNight.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_add_sslcommerz_payment'),
+        ('hotel', '0003_seo_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('state', models.CharField(choices=[('booked', 'Booked'), ('occupied', 'Occupied')], default='booked', max_length=20)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='booking.booking')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='hotel.room')),
+            ],
+            options={
+                'ordering': ['room', 'date'],
+                'indexes': [models.Index(fields=['room', 'date'], name='booking_roo_room_id_7d11e0_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_room_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+
+def drop_duplicate_nights(apps, schema_editor):
+    """Earlier overlapping bookings keep the first claim on a night"""
+    RoomNight = apps.get_model('booking', 'RoomNight')
+    duplicates = (
+        RoomNight.objects.values('room_id', 'date')
+        .annotate(first_id=models.Min('id'), claims=models.Count('id'))
+        .filter(claims__gt=1)
+    )
+    for row in duplicates.iterator():
+        RoomNight.objects.filter(room_id=row['room_id'], date=row['date']).exclude(
+            id=row['first_id']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_room_night'),
+        ('hotel', '0003_seo_fields'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='roomnight',
+            name='booking_roo_room_id_7d11e0_idx',
+        ),
+        migrations.AlterField(
+            model_name='roomnight',
+            name='state',
+            field=models.CharField(choices=[('held', 'Held'), ('booked', 'Booked'), ('occupied', 'Occupied')], default='booked', max_length=20),
+        ),
+        migrations.RunPython(drop_duplicate_nights, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='roomnight',
+            constraint=models.UniqueConstraint(fields=('room', 'date'), name='unique_room_night'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0004_unique_room_night'),
+        ('hotel', '0003_seo_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomnight',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='When a hold lapses', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='roomnight',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False)), fields=['expires_at'], name='roomnight_hold_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0005_room_night_holds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='auto_assigned',
+            field=models.BooleanField(default=False, help_text='Booked by room type; the optimizer may move it to another room of that type'),
+        ),
+    ]
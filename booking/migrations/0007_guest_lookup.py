@@ -0,0 +1,48 @@
+import re
+
+from django.db import migrations, models
+
+
+def fill_guest_search_keys(apps, schema_editor):
+    """Normalize the email and phone of existing bookings"""
+    Booking = apps.get_model('booking', 'Booking')
+
+    batch = []
+    for booking in Booking.objects.only('id', 'guest_email', 'guest_phone').iterator():
+        booking.guest_email_normalized = booking.guest_email.strip().lower()
+        booking.guest_phone_normalized = re.sub(r'\D', '', booking.guest_phone)
+        batch.append(booking)
+        if len(batch) >= 1000:
+            Booking.objects.bulk_update(batch, ['guest_email_normalized', 'guest_phone_normalized'])
+            batch = []
+    if batch:
+        Booking.objects.bulk_update(batch, ['guest_email_normalized', 'guest_phone_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0006_booking_auto_assigned'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='guest_email_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='guest_phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_guest_search_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['guest_email_normalized', '-created_at'], name='booking_guest_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['guest_phone_normalized', '-created_at'], name='booking_guest_phone_idx'),
+        ),
+    ]
@@ -1,9 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from hotel.models import Room, Hotel
 from django.utils import timezone
 from datetime import timedelta
-from decimal import Decimal
 
 class Booking(models.Model):
     """Room booking model"""
@@ -32,6 +31,9 @@ class Booking(models.Model):
     guest_name = models.CharField(max_length=100)
     guest_email = models.EmailField()
     guest_phone = models.CharField(max_length=20)
+    # Search keys for the guest lookup, kept in step with the fields above
+    guest_email_normalized = models.CharField(max_length=254, blank=True, editable=False)
+    guest_phone_normalized = models.CharField(max_length=20, blank=True, editable=False)
     
     room_price_per_night = models.DecimalField(max_digits=10, decimal_places=2)
     number_of_nights = models.IntegerField()
@@ -45,6 +47,10 @@ class Booking(models.Model):
     
     special_requests = models.TextField(blank=True)
     notes = models.TextField(blank=True)
+    auto_assigned = models.BooleanField(
+        default=False,
+        help_text="Booked by room type; the optimizer may move it to another room of that type"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -58,12 +64,36 @@ class Booking(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['booking_id']),
+            models.Index(fields=['guest_email_normalized', '-created_at'], name='booking_guest_email_idx'),
+            models.Index(fields=['guest_phone_normalized', '-created_at'], name='booking_guest_phone_idx'),
         ]
     
     def __str__(self):
         return f"Booking {self.booking_id} - {self.user.username}"
     
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the inventory footprint so save() only rewrites room nights on change
+        deferred = instance.get_deferred_fields()
+        if deferred.isdisjoint(['room_id', 'check_in_date', 'check_out_date', 'status']):
+            instance._inventory_state = instance.get_inventory_state()
+        return instance
+    
+    def get_inventory_state(self):
+        """Room, dates and night state this booking occupies, or None if it blocks nothing"""
+        from .inventory import NIGHT_STATES
+        night_state = NIGHT_STATES.get(self.status)
+        if night_state is None:
+            return None
+        return (self.room_id, self.check_in_date, self.check_out_date, night_state)
+    
+    def fill_derived_fields(self):
+        """Booking ID, night count, totals and search keys; also used for bulk_create, which skips save()"""
+        from .guests import normalize_email, normalize_phone
+        self.guest_email_normalized = normalize_email(self.guest_email)
+        self.guest_phone_normalized = normalize_phone(self.guest_phone)
+        
         # Generate booking ID if not exists
         if not self.booking_id:
             import uuid
@@ -72,14 +102,41 @@ class Booking(models.Model):
         # Calculate number of nights and prices if not set
         if self.check_in_date and self.check_out_date:
             self.number_of_nights = (self.check_out_date - self.check_in_date).days
-            if self.room_price_per_night and not self.subtotal:
-                self.subtotal = Decimal(str(self.room_price_per_night)) * self.number_of_nights
+            # An explicit price is kept, even zero for a complimentary stay
+            if self.room_id and self.room_price_per_night is None:
+                from hotel.pricing import quote_stay
+                self.apply_quote(quote_stay(self.room, self.check_in_date, self.check_out_date))
+            elif self.subtotal is None and self.room_price_per_night is not None:
+                from hotel.pricing import compute_tax
+                self.subtotal = self.room_price_per_night * self.number_of_nights
+                self.tax_amount = compute_tax(self.subtotal)
         
         # Calculate total price if components are set
-        if self.subtotal:
-            self.total_price = self.subtotal + self.tax_amount - self.discount_amount
+        if self.subtotal is not None:
+            self.total_price = self.subtotal + (self.tax_amount or 0) - (self.discount_amount or 0)
+    
+    def apply_quote(self, quote):
+        """Copy prices from a hotel.pricing Quote"""
+        self.number_of_nights = quote.nights
+        self.room_price_per_night = quote.nightly_rate
+        self.subtotal = quote.subtotal
+        self.tax_amount = quote.tax
+        self.total_price = quote.subtotal + quote.tax - (self.discount_amount or 0)
+    
+    def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        
+        inventory_state = self.get_inventory_state()
+        previous_state = getattr(self, '_inventory_state', None)
         
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            # Keep the room-night inventory in step with status and date changes
+            if inventory_state != previous_state:
+                from .inventory import sync_room_nights
+                sync_room_nights(self, previous_state=previous_state)
+        self._inventory_state = inventory_state
     
     def get_days_until_checkin(self):
         return (self.check_in_date - timezone.now().date()).days
@@ -102,6 +159,44 @@ class Booking(models.Model):
         self.status = 'checked_out'
         self.checked_out_at = timezone.now()
         self.save()
+    
+    def cancel(self):
+        self.status = 'cancelled'
+        self.cancelled_at = timezone.now()
+        self.save()
+
+
+class RoomNight(models.Model):
+    """Materialized room-night inventory: one row per room per blocked night"""
+    STATE_CHOICES = [
+        ('held', 'Held'),
+        ('booked', 'Booked'),
+        ('occupied', 'Occupied'),
+    ]
+    
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='nights')
+    date = models.DateField()
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='nights')
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='booked')
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="When a hold lapses")
+    
+    class Meta:
+        ordering = ['room', 'date']
+        constraints = [
+            # One booking per room per night, enforced by the database
+            models.UniqueConstraint(fields=['room', 'date'], name='unique_room_night'),
+        ]
+        indexes = [
+            # Sweeper index: covers holds only
+            models.Index(
+                fields=['expires_at'],
+                name='roomnight_hold_expiry_idx',
+                condition=models.Q(expires_at__isnull=False),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Room {self.room_id} - {self.date} ({self.state})"
 
 
 class Payment(models.Model):
@@ -0,0 +1,22 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Booking
+from .stats import invalidate_booking_stats
+
+
+STATS_FIELDS = {'user', 'status', 'check_in_date'}
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_stats_for_booking(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal handler to expire the cached booking counts of the booking's user.
+    """
+    if update_fields is not None and STATS_FIELDS.isdisjoint(update_fields):
+        return
+    # After commit, so no reader caches the old counts under the new stamp
+    transaction.on_commit(partial(invalidate_booking_stats, instance.user_id))
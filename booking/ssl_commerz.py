@@ -33,8 +33,8 @@ class SSLCommerczPaymentGateway:
         """
         
         # Get or create user profile to ensure it exists
-        from users.models import UserProfile
-        profile, _ = UserProfile.objects.get_or_create(user=request.user)
+        from users.profiles import get_profile
+        profile = get_profile(request.user)
         
         try:
             # Create SSLCOMMERZ instance with only required parameters
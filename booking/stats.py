@@ -0,0 +1,47 @@
+"""
+Per-user booking statistics
+All of a user's booking counts come from one conditional aggregation
+(COUNT ... FILTER per status) and are cached under a per-user version
+stamp. Booking signals bump the stamp once a transaction that creates,
+changes or deletes a booking commits, so the cached counts are never stale.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from hotel.cache import bump_version, get_version
+from .models import Booking
+
+
+BOOKING_STATS_CACHE_TIMEOUT = 60 * 60 * 24
+UPCOMING_STATUSES = ('pending', 'confirmed')
+
+
+def booking_stats_version_name(user_id):
+    return f'booking-stats:{user_id}'
+
+
+def invalidate_booking_stats(*user_ids):
+    bump_version(*[booking_stats_version_name(user_id) for user_id in user_ids])
+
+
+def compute_booking_stats(user_id, today):
+    """{'total', 'upcoming', <status>: count} of the user's bookings in one query"""
+    return Booking.objects.filter(user_id=user_id).aggregate(
+        total=Count('id'),
+        upcoming=Count('id', filter=Q(status__in=UPCOMING_STATUSES, check_in_date__gte=today)),
+        **{status: Count('id', filter=Q(status=status)) for status, _ in Booking.STATUS_CHOICES},
+    )
+
+
+def get_booking_stats(user):
+    """Cached booking counts of a user; see compute_booking_stats()"""
+    today = timezone.localdate()
+    # Upcoming bookings depend on the date, so the key does too
+    key = f'rhms:booking-stats:{user.pk}:{get_version(booking_stats_version_name(user.pk))}:{today.isoformat()}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_booking_stats(user.pk, today)
+        cache.set(key, stats, BOOKING_STATS_CACHE_TIMEOUT)
+    return stats
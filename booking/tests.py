@@ -1,3 +1,573 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from hotel.cache import get_version
+from hotel.calendars import month_version_name
+from hotel.defaults import default_hotel_cache
+from hotel.models import Hotel, RoomType, Room
+from hotel.search import allocate_group, distribute_guests
+from .models import Booking, RoomNight
+from .inventory import (
+    reserve_room, reserve_rooms, refresh_hold, release_expired_holds, rebuild_room_nights, availability_matrix,
+    RoomUnavailable,
+)
+from .assignment import RoomPlanner, assign_room, reoptimize_room_type
+from .stats import get_booking_stats
+from .guests import guest_bookings
+
+
+def create_hotel_with_rooms(room_count):
+    hotel = Hotel.objects.create(
+        name='Test Hotel', slug='test-hotel', description='Test', email='hotel@example.com',
+        phone='123', address='1 Street', city='Dhaka', state='Dhaka', country='Bangladesh',
+        postal_code='1000', image='hotels/test.jpg', banner='hotels/banners/test.jpg',
+    )
+    room_type = RoomType.objects.create(
+        hotel=hotel, name='Double', description='Double room', max_guests=2,
+        beds='Double bed', amenities='WiFi', image='room_types/test.jpg',
+    )
+    rooms = [
+        Room.objects.create(
+            hotel=hotel, room_type=room_type, room_number=str(101 + i),
+            floor=1, price_per_night='100.00',
+        )
+        for i in range(room_count)
+    ]
+    return hotel, rooms
+
+
+def make_booking(user, room, check_in, nights, status='pending'):
+    return Booking(
+        user=user, room=room, hotel_id=room.hotel_id,
+        check_in_date=check_in, check_out_date=check_in + timedelta(days=nights),
+        guest_name='Guest', guest_email='guest@example.com', guest_phone='123',
+        room_price_per_night=room.price_per_night, number_of_nights=nights,
+        subtotal=0, total_price=0, status=status,
+    )
+
+
+def overlapping_pairs(bookings):
+    """Pairs of blocking bookings on the same room whose stays overlap"""
+    pairs = []
+    for i, a in enumerate(bookings):
+        for b in bookings[i + 1:]:
+            if (a.room_id == b.room_id and a.check_in_date < b.check_out_date
+                    and b.check_in_date < a.check_out_date):
+                pairs.append((a.id, b.id))
+    return pairs
+
+
+class RoomNightInventoryTest(TestCase):
+    def setUp(self):
+        self.hotel, self.rooms = create_hotel_with_rooms(1)
+        self.room = self.rooms[0]
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'pass12345')
+        self.check_in = date.today() + timedelta(days=10)
+
+    def test_reserve_rejects_overlapping_stay(self):
+        reserve_room(make_booking(self.user, self.room, self.check_in, 3))
+
+        with self.assertRaises(RoomUnavailable):
+            reserve_room(make_booking(self.user, self.room, self.check_in + timedelta(days=2), 2))
+
+        reserve_room(make_booking(self.user, self.room, self.check_in + timedelta(days=3), 2))
+        self.assertEqual(RoomNight.objects.filter(room=self.room).count(), 5)
+
+    def test_state_transitions_keep_nights_in_step(self):
+        booking = reserve_room(make_booking(self.user, self.room, self.check_in, 2))
+        self.assertEqual(set(booking.nights.values_list('state', flat=True)), {'held'})
+
+        booking.confirm_booking()
+        self.assertEqual(set(booking.nights.values_list('state', flat=True)), {'booked'})
+
+        booking.cancel()
+        self.assertFalse(booking.nights.exists())
+        self.assertTrue(self.room.is_available(self.check_in, self.check_in + timedelta(days=2)))
+
+    def test_calendar_stamps_move_after_commit(self):
+        name = month_version_name(self.hotel.id, self.check_in.year, self.check_in.month)
+        before = get_version(name)
+        with self.captureOnCommitCallbacks() as callbacks:
+            reserve_room(make_booking(self.user, self.room, self.check_in, 2))
+            self.assertEqual(get_version(name), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_version(name), before)
+
+
+class BookingPriceTest(TestCase):
+    def setUp(self):
+        self.hotel, self.rooms = create_hotel_with_rooms(1)
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'pass12345')
+        self.check_in = date.today() + timedelta(days=10)
+
+    def test_explicit_zero_price_is_kept(self):
+        booking = make_booking(self.user, self.rooms[0], self.check_in, 2)
+        booking.room_price_per_night = Decimal('0')
+        booking.save()
+        booking.refresh_from_db()
+        self.assertEqual((booking.subtotal, booking.total_price), (0, 0))
+
+    def test_unpriced_booking_is_quoted(self):
+        booking = make_booking(self.user, self.rooms[0], self.check_in, 2)
+        booking.room_price_per_night = booking.subtotal = booking.total_price = None
+        booking.save()
+        self.assertEqual((booking.room_price_per_night, booking.subtotal), (Decimal('100.00'), Decimal('200.00')))
+        self.assertEqual(booking.total_price, Decimal('220.00'))
+
+
+class HoldExpiryTest(TestCase):
+    def setUp(self):
+        self.hotel, self.rooms = create_hotel_with_rooms(1)
+        self.room = self.rooms[0]
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'pass12345')
+        self.check_in = date.today() + timedelta(days=10)
+        self.check_out = self.check_in + timedelta(days=2)
+
+    def expire_holds(self, booking):
+        booking.nights.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+    def test_expired_hold_stops_blocking(self):
+        first = reserve_room(make_booking(self.user, self.room, self.check_in, 2))
+        self.assertFalse(self.room.is_available(self.check_in, self.check_out))
+
+        self.expire_holds(first)
+        self.assertTrue(self.room.is_available(self.check_in, self.check_out))
+
+        # The lapsed hold is purged by the next claim, before the sweeper runs
+        second = reserve_room(make_booking(self.user, self.room, self.check_in, 2))
+        self.assertEqual(second.nights.count(), 2)
+        with self.assertRaises(RoomUnavailable):
+            refresh_hold(first)
+
+    def test_sweeper_releases_only_expired_holds(self):
+        expired = reserve_room(make_booking(self.user, self.room, self.check_in, 2))
+        active = reserve_room(make_booking(self.user, self.room, self.check_out, 3))
+        confirmed = reserve_room(make_booking(self.user, self.room, self.check_out + timedelta(days=3), 1))
+        confirmed.confirm_booking()
+        self.expire_holds(expired)
+
+        self.assertEqual(release_expired_holds(), 2)
+        self.assertFalse(expired.nights.exists())
+        self.assertEqual(active.nights.count(), 3)
+        self.assertIsNone(confirmed.nights.get().expires_at)
+
+    def test_refresh_reclaims_lapsed_hold_when_room_still_free(self):
+        booking = reserve_room(make_booking(self.user, self.room, self.check_in, 2))
+        self.expire_holds(booking)
+        release_expired_holds()
+
+        self.assertGreater(refresh_hold(booking), timezone.now())
+        self.assertEqual(booking.nights.count(), 2)
+
+    def test_rebuilt_holds_keep_their_deadline(self):
+        booking = reserve_room(make_booking(self.user, self.room, self.check_in, 2))
+        deadline = booking.nights.first().expires_at
+        rebuild_room_nights(Booking.objects.all())
+        self.assertEqual(set(booking.nights.values_list('state', 'expires_at')), {('held', deadline)})
+
+        # An abandoned checkout is swept after a rebuild like any other hold
+        self.expire_holds(booking)
+        self.assertEqual(release_expired_holds(), 2)
+        Booking.objects.filter(pk=booking.pk).update(created_at=timezone.now() - timedelta(days=1))
+        rebuild_room_nights(Booking.objects.all())
+        self.assertFalse(booking.nights.exists())
+        self.assertTrue(self.room.is_available(self.check_in, self.check_out))
+
+
+class AvailabilityMatrixTest(TestCase):
+    """Many rooms x many ranges resolved from one range scan"""
+
+    def setUp(self):
+        self.hotel, self.rooms = create_hotel_with_rooms(2)
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'pass12345')
+        self.check_in = date.today() + timedelta(days=10)
+        # Room 101 is taken for the nights of day 2 and day 3
+        reserve_room(make_booking(self.user, self.rooms[0], self.day(2), 2, status='confirmed'))
+
+    def day(self, offset):
+        return self.check_in + timedelta(days=offset)
+
+    def test_check_out_day_is_free_and_check_in_day_is_taken(self):
+        first, second = self.rooms
+        ranges = [
+            (self.day(0), self.day(2)),  # leaves on the booking's check-in day
+            (self.day(4), self.day(6)),  # arrives on the booking's check-out day
+            (self.day(1), self.day(3)),  # includes the booking's first night
+            (self.day(3), self.day(5)),  # includes the booking's last night
+            (self.day(0), self.day(6)),  # spans the whole booking
+        ]
+        with self.assertNumQueries(1):
+            matrix = availability_matrix(ranges, room_ids=[first.id, second.id])
+        self.assertEqual(matrix, {
+            first.id: [True, True, False, False, False],
+            second.id: [True] * 5,
+        })
+
+    def test_hotel_or_room_ids_scope_the_rooms(self):
+        other_hotel = Hotel.objects.create(
+            name='Other Hotel', slug='other-hotel', description='Other', email='other@example.com',
+            phone='456', address='2 Street', city='Dhaka', state='Dhaka', country='Bangladesh',
+            postal_code='1000', image='hotels/other.jpg', banner='hotels/banners/other.jpg',
+        )
+        Room.objects.create(
+            hotel=other_hotel, room_type=self.rooms[0].room_type, room_number='201', floor=2, price_per_night='100.00',
+        )
+        stay = [(self.day(2), self.day(3))]
+
+        self.assertEqual(set(availability_matrix(stay, hotel=self.hotel)), {room.id for room in self.rooms})
+        self.assertEqual(availability_matrix(stay, room_ids=[self.rooms[0].id]), {self.rooms[0].id: [False]})
+        self.assertEqual(availability_matrix([], hotel=self.hotel), {room.id: [] for room in self.rooms})
+        with self.assertRaises(ValueError):
+            availability_matrix(stay)
+
+
+class RoomPlannerTest(TestCase):
+    """Best-fit packing on day ordinals"""
+
+    def test_pack_fills_gaps_exactly(self):
+        planner = RoomPlanner([1, 2])
+        planner.add(1, 0, 2)
+        planner.add(1, 3, 6)
+        self.assertEqual(planner.orphan_nights(), 1)
+        self.assertEqual(planner.pack([('stay', 2, 3)]), {'stay': 1})
+        self.assertEqual(planner.orphan_nights(), 0)
+
+    def test_pack_avoids_orphan_gaps(self):
+        planner = RoomPlanner([1, 2])
+        planner.add(1, 0, 5)
+        planner.add(2, 0, 3)
+        # Room 1 would keep a one-night gap, room 2 a sellable three-night one
+        self.assertEqual(planner.pack([('stay', 6, 8)]), {'stay': 2})
+
+    def test_pack_fails_when_a_stay_does_not_fit(self):
+        planner = RoomPlanner([1, 2])
+        planner.add(1, 0, 4)
+        planner.add(2, 2, 6)
+        self.assertIsNone(planner.pack([('a', 4, 6), ('b', 3, 5)]))
+
+
+class RoomAssignmentTest(TestCase):
+    def setUp(self):
+        self.hotel, self.rooms = create_hotel_with_rooms(2)
+        self.room_type = self.rooms[0].room_type
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'pass12345')
+        self.check_in = date.today() + timedelta(days=10)
+
+    def book(self, room, offset, nights, auto_assigned=False):
+        booking = make_booking(self.user, room, self.check_in + timedelta(days=offset), nights, status='confirmed')
+        booking.auto_assigned = auto_assigned
+        return reserve_room(booking)
+
+    def test_assign_room_abuts_existing_stays(self):
+        first, second = self.rooms
+        self.book(first, 0, 2)
+        self.assertEqual(assign_room(self.room_type, self.check_in + timedelta(days=2), self.check_in + timedelta(days=4)), first)
+
+        Room.objects.filter(pk=first.pk).update(status='maintenance')
+        self.assertEqual(assign_room(self.room_type, self.check_in + timedelta(days=2), self.check_in + timedelta(days=4)), second)
+
+        self.book(second, 2, 2)
+        self.assertIsNone(assign_room(self.room_type, self.check_in + timedelta(days=3), self.check_in + timedelta(days=4)))
+
+    def test_reoptimize_moves_into_slot_of_lapsed_hold(self):
+        first, second = self.rooms
+        self.book(first, 0, 2)
+        self.book(first, 3, 3)
+        self.book(second, 4, 2)
+        movable = self.book(second, 2, 1, auto_assigned=True)
+        # A pending hold on the gap that lapsed but was not swept yet
+        lapsed = reserve_room(make_booking(self.user, first, self.check_in + timedelta(days=2), 1))
+        lapsed.nights.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        result = reoptimize_room_type(self.room_type)
+
+        self.assertEqual((result['moved'], result['orphans_before'], result['orphans_after']), (1, 2, 0))
+        movable.refresh_from_db()
+        self.assertEqual(movable.room, first)
+        self.assertEqual(list(movable.nights.values_list('room_id', flat=True)), [first.id])
+        self.assertFalse(lapsed.nights.exists())
+
+    def test_reoptimize_dry_run_changes_nothing(self):
+        first, second = self.rooms
+        self.book(first, 0, 2)
+        self.book(first, 3, 3)
+        self.book(second, 4, 2)
+        movable = self.book(second, 2, 1, auto_assigned=True)
+
+        lapsed = reserve_room(make_booking(self.user, first, self.check_in + timedelta(days=2), 1))
+        lapsed.nights.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(reoptimize_room_type(self.room_type, dry_run=True)['moved'], 1)
+        movable.refresh_from_db()
+        self.assertEqual(movable.room, second)
+        self.assertEqual(lapsed.nights.count(), 1)
+        self.assertEqual(callbacks, [])
+
+    def test_booking_by_type_retries_when_the_chosen_room_is_taken(self):
+        check_out = self.check_in + timedelta(days=2)
+        chosen = assign_room(self.room_type, self.check_in, check_out)
+        other = next(room for room in self.rooms if room != chosen)
+        rival = make_booking(self.user, chosen, self.check_in, 2)
+
+        def reserve_after_rival(booking):
+            # Another guest takes the chosen room between assignment and reservation
+            if rival.pk is None:
+                reserve_room(rival)
+            return reserve_room(booking)
+
+        self.client.force_login(self.user)
+        with mock.patch('booking.views.reserve_room', side_effect=reserve_after_rival) as reserve:
+            response = self.client.post(reverse('booking:create_booking_by_type', args=[self.room_type.id]), {
+                'check_in_date': self.check_in, 'check_out_date': check_out, 'number_of_guests': 1,
+                'guest_name': 'Guest', 'guest_email': 'guest@example.com', 'guest_phone': '123',
+            })
+
+        booking = Booking.objects.exclude(pk=rival.pk).get()
+        self.assertRedirects(response, reverse('booking:booking_detail', args=[booking.id]), fetch_redirect_response=False)
+        self.assertEqual(reserve.call_count, 2)
+        self.assertEqual((booking.room, booking.auto_assigned), (other, True))
+        self.assertEqual(list(booking.nights.values_list('room_id', flat=True)), [other.id, other.id])
+
+
+class GroupAllocationTest(TestCase):
+    """Group allocation picks compact runs of rooms and fills them within capacity"""
+
+    def rooms(self, *specs):
+        """(room_number, floor, max_guests) -> unsaved rooms"""
+        return [
+            Room(id=i, room_number=number, floor=floor, room_type=RoomType(max_guests=max_guests))
+            for i, (number, floor, max_guests) in enumerate(specs, start=1)
+        ]
+
+    def test_prefers_adjacent_rooms_with_least_spare_capacity(self):
+        rooms = self.rooms(('101', 1, 4), ('102', 1, 2), ('103', 1, 2), ('201', 2, 4), ('202', 2, 4))
+        allocation = allocate_group(rooms, 2, 4)
+        self.assertEqual([room.room_number for room, _ in allocation], ['102', '103'])
+        self.assertEqual([guests for _, guests in allocation], [2, 2])
+
+    def test_falls_back_to_largest_rooms_across_floors(self):
+        rooms = self.rooms(('101', 1, 2), ('102', 1, 1), ('201', 2, 4), ('301', 3, 4))
+        allocation = allocate_group(rooms, 2, 8)
+        self.assertEqual([room.room_number for room, _ in allocation], ['201', '301'])
+        self.assertIsNone(allocate_group(rooms, 2, 9))
+
+    def test_rejects_fewer_guests_than_rooms(self):
+        rooms = self.rooms(('101', 1, 2), ('102', 1, 2), ('103', 1, 2))
+        self.assertIsNone(allocate_group(rooms, 3, 2))
+        with self.assertRaises(ValueError):
+            distribute_guests([2, 2, 2], 2)
+
+    def test_guests_spread_within_capacity(self):
+        for capacities, guests in (([2, 2, 4], 5), ([1, 4], 5), ([3, 3, 3], 3), ([2, 6], 4)):
+            with self.subTest(capacities=capacities, guests=guests):
+                assigned = distribute_guests(capacities, guests)
+                self.assertEqual(sum(assigned), guests)
+                self.assertTrue(all(1 <= count <= capacity for count, capacity in zip(assigned, capacities)))
+        self.assertEqual(distribute_guests([2, 6], 4), [2, 2])
+
+
+class GroupReservationTest(TestCase):
+    """Group bookings are all-or-nothing"""
+
+    def setUp(self):
+        cache.clear()
+        self.hotel, self.rooms = create_hotel_with_rooms(3)
+        self.user = User.objects.create_user('desk', 'desk@example.com', 'pass12345', is_staff=True)
+        self.check_in = date.today() + timedelta(days=10)
+        settings_override = override_settings(DEFAULT_HOTEL_ID=self.hotel.id)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        default_hotel_cache.clear()
+        self.addCleanup(default_hotel_cache.clear)
+
+    def test_one_taken_room_rolls_back_the_group(self):
+        reserve_room(make_booking(self.user, self.rooms[2], self.check_in + timedelta(days=1), 1))
+
+        with self.assertRaises(RoomUnavailable):
+            reserve_rooms([make_booking(self.user, room, self.check_in, 2) for room in self.rooms])
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(RoomNight.objects.count(), 1)
+
+        bookings = reserve_rooms([make_booking(self.user, room, self.check_in, 2) for room in self.rooms[:2]])
+        self.assertEqual(RoomNight.objects.filter(booking__in=bookings).count(), 4)
+
+    def post_group(self, **data):
+        self.client.force_login(self.user)
+        return self.client.post(reverse('booking:group_booking_create'), {
+            'check_in_date': self.check_in, 'check_out_date': self.check_in + timedelta(days=2),
+            'guest_name': 'Group', 'guest_email': 'group@example.com', 'guest_phone': '123', **data,
+        })
+
+    def test_view_rolls_back_when_a_chosen_room_is_taken(self):
+        reserve_room(make_booking(self.user, self.rooms[1], self.check_in, 1))
+        response = self.post_group(guests=4, rooms=[room.id for room in self.rooms[:2]])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Booking.objects.count(), 1)
+
+        response = self.post_group(guests=3, rooms_needed=2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['bookings']), 2)
+
+    def test_rooms_out_of_service_cannot_be_chosen(self):
+        Room.objects.filter(pk=self.rooms[0].pk).update(status='maintenance')
+        response = self.post_group(guests=2, rooms=[self.rooms[0].id])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rooms', response.json()['errors'])
+
+        response = self.post_group(guests=1, rooms_needed=2)
+        self.assertEqual(response.status_code, 400)
+
+
+class BookingStatsTest(TestCase):
+    """Per-user booking counts come from one cached aggregate query"""
+
+    def setUp(self):
+        cache.clear()
+        self.hotel, self.rooms = create_hotel_with_rooms(2)
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'pass12345')
+        self.check_in = date.today() + timedelta(days=10)
+
+    def test_counts_in_one_query_and_cached_until_state_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = reserve_room(make_booking(self.user, self.rooms[0], self.check_in, 2))
+            reserve_room(make_booking(self.user, self.rooms[1], self.check_in, 2)).cancel()
+
+        with self.assertNumQueries(1):
+            stats = get_booking_stats(self.user)
+        self.assertEqual((stats['total'], stats['pending'], stats['cancelled'], stats['upcoming']), (2, 1, 1, 1))
+        self.assertNumQueries(0, get_booking_stats, self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.confirm_booking()
+        stats = get_booking_stats(self.user)
+        self.assertEqual((stats['pending'], stats['confirmed'], stats['upcoming']), (0, 1, 1))
+
+    def test_group_bookings_expire_counts_after_commit(self):
+        self.assertEqual(get_booking_stats(self.user)['total'], 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            reserve_rooms([make_booking(self.user, room, self.check_in, 1) for room in self.rooms])
+            # Until the bookings commit, other readers still see the cached counts
+            self.assertEqual(get_booking_stats(self.user)['total'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_booking_stats(self.user)['total'], 2)
+
+    def test_booking_list_uses_stats(self):
+        reserve_room(make_booking(self.user, self.rooms[0], self.check_in, 2)).confirm_booking()
+        self.client.login(username='guest', password='pass12345')
+        response = self.client.get(reverse('booking:booking_list'))
+        self.assertEqual((response.context['total_bookings'], response.context['confirmed_bookings']), (1, 1))
+
+
+class GuestLookupTest(TestCase):
+    """Guest search matches normalized email and phone prefixes through their indexes"""
+
+    def setUp(self):
+        self.hotel, self.rooms = create_hotel_with_rooms(1)
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'pass12345')
+        check_in = date.today() + timedelta(days=10)
+        self.bookings = []
+        for i, (email, phone) in enumerate([
+            ('Ana.Khan@Example.com ', '+880 1700-000001'),
+            ('ana.kabir@example.com', '01800000002'),
+            ('bob@example.com', '+880 1700 000003'),
+        ]):
+            booking = make_booking(self.user, self.rooms[0], check_in + timedelta(days=3 * i), 1)
+            booking.guest_email = email
+            booking.guest_phone = phone
+            booking.save()
+            self.bookings.append(booking)
+
+    def test_prefix_search_is_case_and_format_insensitive(self):
+        ana_khan, ana_kabir, bob = self.bookings
+        self.assertEqual(set(guest_bookings(email='ANA.K')), {ana_khan, ana_kabir})
+        self.assertEqual(list(guest_bookings(email='ana.khan@example.com')), [ana_khan])
+        self.assertEqual(set(guest_bookings(phone='880-1700')), {ana_khan, bob})
+        self.assertEqual(list(guest_bookings(email='ana', phone='880')), [ana_khan])
+        self.assertFalse(guest_bookings())
+
+    def test_search_view_paginates_with_related_rows(self):
+        staff = User.objects.create_user('desk', 'desk@example.com', 'pass12345', is_staff=True)
+        self.client.force_login(staff)
+        with self.assertNumQueries(4):  # session, user, count, page
+            response = self.client.get(reverse('booking:booking_search'), {'email': 'ana'})
+        self.assertEqual(len(response.context['bookings']), 2)
+        self.assertContains(response, self.bookings[0].booking_id)
+
+        response = self.client.get(reverse('booking:booking_search'), {'phone': '8'})
+        self.assertFormError(response.context['form'], 'phone', 'Enter at least 3 digits.')
+
+    def test_search_requires_staff(self):
+        self.client.login(username='guest', password='pass12345')
+        response = self.client.get(reverse('booking:booking_search'), {'email': 'ana'})
+        self.assertEqual(response.status_code, 302)
+
+
+class ConcurrentReservationTest(TransactionTestCase):
+    """Many threads race to reserve overlapping stays on a handful of rooms"""
+    THREADS = 8
+    ATTEMPTS_PER_THREAD = 30
+    RETRIES = 200
+
+    def setUp(self):
+        self.hotel, self.rooms = create_hotel_with_rooms(3)
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'pass12345')
+        self.start = date.today() + timedelta(days=30)
+
+    def _worker(self, seed, results, lock):
+        rng = random.Random(seed)
+        try:
+            for _ in range(self.ATTEMPTS_PER_THREAD):
+                room = rng.choice(self.rooms)
+                check_in = self.start + timedelta(days=rng.randrange(20))
+                nights = rng.randint(1, 4)
+                outcome = 'contended'
+                for _ in range(self.RETRIES):
+                    try:
+                        reserve_room(make_booking(self.user, room, check_in, nights))
+                        outcome = 'reserved'
+                        break
+                    except RoomUnavailable:
+                        outcome = 'rejected'
+                        break
+                    except OperationalError:
+                        # SQLite reports write contention as a locked table; retry
+                        time.sleep(rng.random() / 500)
+                with lock:
+                    results[outcome] += 1
+        finally:
+            connection.close()
+
+    def test_no_overlapping_bookings_under_contention(self):
+        results = {'reserved': 0, 'rejected': 0, 'contended': 0}
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(target=self._worker, args=(seed, results, lock))
+            for seed in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        bookings = list(Booking.objects.filter(status='pending'))
+        self.assertEqual(len(bookings), results['reserved'])
+        self.assertGreater(results['rejected'], 0)
+        self.assertEqual(overlapping_pairs(bookings), [])
+        self.assertEqual(
+            RoomNight.objects.count(),
+            sum(booking.number_of_nights for booking in bookings),
+        )
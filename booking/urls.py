@@ -6,9 +6,12 @@ app_name = 'booking'
 urlpatterns = [
     # Booking management
     path('create/<int:room_id>/', views.BookingCreateView.as_view(), name='create_booking'),
+    path('create/type/<int:room_type_id>/', views.RoomTypeBookingCreateView.as_view(), name='create_booking_by_type'),
+    path('group/create/', views.group_booking_create, name='group_booking_create'),
     path('<int:booking_id>/', views.BookingDetailView.as_view(), name='booking_detail'),
     path('my-bookings/', views.BookingListView.as_view(), name='booking_list'),
     path('search/', views.booking_search, name='booking_search'),
+    path('quote-cache/', views.quote_cache_stats, name='quote_cache_stats'),
     
     # Payment
     path('<int:booking_id>/payment/', views.PaymentView.as_view(), name='payment'),
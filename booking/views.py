@@ -4,14 +4,24 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.utils import timezone
 from django.http import JsonResponse
+from django.core.paginator import Paginator
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.contrib.admin.views.decorators import staff_member_required
 from decimal import Decimal
 import uuid
 
 from .models import Booking, Payment, CancellationPolicy
-from .forms import BookingForm, PaymentForm, BookingSearchForm, CancellationForm
+from .forms import BookingForm, GroupBookingForm, PaymentForm, BookingSearchForm, CancellationForm
+from .inventory import reserve_room, reserve_rooms, refresh_hold, RoomUnavailable
+from .stats import get_booking_stats
+from .guests import SEARCH_PAGE_SIZE, guest_bookings
+from .assignment import assign_room, bookable_rooms
 from .ssl_commerz import SSLCommerczPaymentGateway
-from hotel.models import Room, Hotel
+from hotel.models import Room, RoomType, Hotel
+from hotel.search import find_group_allocation, distribute_guests
+from hotel.pricing import cached_quote, quote_cache, quote_stay, quote_stays, tax_rate
+from hotel.defaults import get_default_hotel
 
 
 class BookingCreateView(LoginRequiredMixin, CreateView):
@@ -21,57 +31,70 @@ class BookingCreateView(LoginRequiredMixin, CreateView):
     template_name = 'booking/booking_form.html'
     
     def dispatch(self, request, *args, **kwargs):
-        self.room = get_object_or_404(Room, id=kwargs['room_id'])
+        self.room = get_object_or_404(Room.objects.select_related('hotel', 'room_type'), id=kwargs['room_id'])
         self.hotel = self.room.hotel
         return super().dispatch(request, *args, **kwargs)
     
+    def get_requested_dates(self):
+        """(check_in, check_out) from the GET parameters, parsed once per request"""
+        if not hasattr(self, '_requested_dates'):
+            self._requested_dates = (None, None)
+            check_in = self.request.GET.get('check_in')
+            check_out = self.request.GET.get('check_out')
+            if check_in and check_out:
+                from datetime import datetime
+                try:
+                    self._requested_dates = (
+                        datetime.strptime(check_in, '%Y-%m-%d').date(),
+                        datetime.strptime(check_out, '%Y-%m-%d').date(),
+                    )
+                except ValueError:
+                    # If date parsing fails, just ignore
+                    pass
+        return self._requested_dates
+    
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs['room'] = self.room
         
         # Pre-fill dates from GET parameters if provided
-        check_in = self.request.GET.get('check_in')
-        check_out = self.request.GET.get('check_out')
-        
-        if check_in and check_out and 'data' not in kwargs:
-            # Initialize with GET data
-            from datetime import datetime
-            try:
-                ci = datetime.strptime(check_in, '%Y-%m-%d').date()
-                co = datetime.strptime(check_out, '%Y-%m-%d').date()
-                kwargs['initial'] = {
-                    'check_in_date': ci,
-                    'check_out_date': co,
-                }
-            except ValueError:
-                # If date parsing fails, just ignore
-                pass
+        ci, co = self.get_requested_dates()
+        if ci and co and 'data' not in kwargs:
+            kwargs['initial'] = {
+                'check_in_date': ci,
+                'check_out_date': co,
+            }
         
         return kwargs
     
-    def form_valid(self, form):
+    def build_booking(self, form):
         booking = form.save(commit=False)
         booking.user = self.request.user
         booking.room = self.room
         booking.hotel = self.hotel
         
-        # Set pricing
-        booking.room_price_per_night = self.room.get_price()
-        booking.number_of_nights = (booking.check_out_date - booking.check_in_date).days
-        booking.subtotal = Decimal(str(booking.room_price_per_night)) * booking.number_of_nights
-        
-        # Calculate tax (10%)
-        booking.tax_amount = booking.subtotal * Decimal('0.10')
-        booking.total_price = booking.subtotal + booking.tax_amount
+        # Set pricing from the rate calendar
+        booking.apply_quote(quote_stay(self.room, booking.check_in_date, booking.check_out_date))
         
         booking.status = 'pending'
-        booking.save()
+        return booking
+    
+    def form_valid(self, form):
+        booking = self.build_booking(form)
+        
+        # Availability check and insert happen atomically under a room lock
+        try:
+            reserve_room(booking)
+        except RoomUnavailable as e:
+            form.add_error(None, str(e))
+            return self.form_invalid(form)
         
+        return self.booking_reserved(booking)
+    
+    def booking_reserved(self, booking):
         # Update user profile
-        from users.models import UserProfile
-        profile, created = UserProfile.objects.get_or_create(user=self.request.user)
-        profile.total_bookings += 1
-        profile.save()
+        from users.profiles import add_bookings
+        add_bookings(self.request.user)
         
         return redirect('booking:booking_detail', booking_id=booking.id)
     
@@ -79,34 +102,153 @@ class BookingCreateView(LoginRequiredMixin, CreateView):
         context = super().get_context_data(**kwargs)
         context['room'] = self.room
         context['hotel'] = self.hotel
+        context['tax_percent'] = tax_rate() * 100
         
-        # Calculate estimated prices
-        check_in = self.request.GET.get('check_in')
-        check_out = self.request.GET.get('check_out')
+        # Calculate estimated prices; search result links repeat the same
+        # room and dates, so quotes come from the per-process memo
+        ci, co = self.get_requested_dates()
+        if ci and co and co > ci:
+            quote = cached_quote(self.room, ci, co)
+            
+            context['nightly_rate'] = quote.nightly_rate
+            context['estimated_subtotal'] = quote.subtotal
+            context['estimated_tax'] = quote.tax
+            context['estimated_total'] = quote.total
+            context['nights'] = quote.nights
         
-        if check_in and check_out:
-            from datetime import datetime
+        return context
+
+
+class RoomTypeBookingCreateView(BookingCreateView):
+    """Book a room type; the physical room is picked by the assignment engine"""
+    ASSIGNMENT_ATTEMPTS = 3
+    
+    def dispatch(self, request, *args, **kwargs):
+        self.room_type = get_object_or_404(RoomType.objects.select_related('hotel'), id=kwargs['room_type_id'])
+        self.hotel = self.room_type.hotel
+        self.room = self.preview_room()
+        if self.room is None:
+            messages.error(request, 'No rooms of this type are available.')
+            return redirect('hotel:hotel_detail')
+        return super(BookingCreateView, self).dispatch(request, *args, **kwargs)
+    
+    def preview_room(self):
+        """Room used for the price estimate before the stay is assigned"""
+        check_in, check_out = self.get_requested_dates()
+        if check_in and check_out and check_out > check_in:
+            room = assign_room(self.room_type, check_in, check_out)
+            if room:
+                return room
+        return bookable_rooms(self.room_type).select_related('room_type').order_by('price_per_night').first()
+    
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['room'] = None
+        kwargs['room_type'] = self.room_type
+        return kwargs
+    
+    def form_valid(self, form):
+        check_in = form.cleaned_data['check_in_date']
+        check_out = form.cleaned_data['check_out_date']
+        tried = []
+        
+        # Another guest may grab the chosen room first; fall back to the next best fit
+        for _ in range(self.ASSIGNMENT_ATTEMPTS):
+            room = assign_room(self.room_type, check_in, check_out, exclude_ids=tried)
+            if room is None:
+                break
+            self.room = room
+            booking = self.build_booking(form)
+            booking.auto_assigned = True
             try:
-                ci = datetime.strptime(check_in, '%Y-%m-%d').date()
-                co = datetime.strptime(check_out, '%Y-%m-%d').date()
-                nights = (co - ci).days
-                
-                if nights > 0:
-                    subtotal = Decimal(str(self.room.get_price())) * nights
-                    tax = subtotal * Decimal('0.10')
-                    total = subtotal + tax
-                    
-                    context['estimated_subtotal'] = subtotal
-                    context['estimated_tax'] = tax
-                    context['estimated_total'] = total
-                    context['nights'] = nights
-            except (ValueError, TypeError):
-                # If date parsing fails, just skip price calculation
-                pass
-        
+                reserve_room(booking)
+            except RoomUnavailable:
+                tried.append(room.id)
+                continue
+            return self.booking_reserved(booking)
+        
+        form.add_error(None, "No rooms of this type are available for selected dates.")
+        return self.form_invalid(form)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['room_type'] = self.room_type
+        context['auto_assign'] = True
         return context
 
 
+@staff_member_required
+@require_POST
+def group_booking_create(request):
+    """Book several rooms for one group in a single transaction (front desk)"""
+    form = GroupBookingForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    
+    hotel = get_default_hotel()
+    data = form.cleaned_data
+    check_in = data['check_in_date']
+    check_out = data['check_out_date']
+    
+    rooms = list(data['rooms'])
+    if rooms:
+        if any(room.hotel_id != hotel.id for room in rooms):
+            return JsonResponse({'errors': {'rooms': 'Rooms must belong to this hotel.'}}, status=400)
+        capacities = [room.room_type.max_guests if room.room_type else 1 for room in rooms]
+        allocation = list(zip(rooms, distribute_guests(capacities, data['guests'])))
+    else:
+        allocation = find_group_allocation(hotel, check_in, check_out, data['rooms_needed'], data['guests'])
+        if allocation is None:
+            return JsonResponse({'error': 'Not enough rooms available for this group.'}, status=409)
+    
+    quotes = quote_stays((room, check_in, check_out) for room, _ in allocation)
+    bookings = []
+    for (room, guests), quote in zip(allocation, quotes):
+        bookings.append(Booking(
+            user=request.user,
+            room=room,
+            hotel=hotel,
+            check_in_date=check_in,
+            check_out_date=check_out,
+            number_of_guests=guests,
+            guest_name=data['guest_name'],
+            guest_email=data['guest_email'],
+            guest_phone=data['guest_phone'],
+            special_requests=data['special_requests'],
+            room_price_per_night=quote.nightly_rate,
+            number_of_nights=quote.nights,
+            subtotal=quote.subtotal,
+            tax_amount=quote.tax,
+            total_price=quote.total,
+            status='confirmed',
+            confirmed_at=timezone.now(),
+        ))
+    
+    try:
+        reserve_rooms(bookings)
+    except RoomUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    
+    return JsonResponse({
+        'bookings': [
+            {
+                'id': booking.id,
+                'booking_id': booking.booking_id,
+                'room': booking.room.room_number,
+                'guests': booking.number_of_guests,
+                'total_price': str(booking.total_price),
+            }
+            for booking in bookings
+        ],
+    }, status=201)
+
+
+@staff_member_required
+def quote_cache_stats(request):
+    """Hit/miss counters of this worker's booking quote cache"""
+    return JsonResponse(quote_cache.stats())
+
+
 class BookingDetailView(LoginRequiredMixin, DetailView):
     """View booking details"""
     model = Booking
@@ -155,9 +297,10 @@ class BookingListView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         
         # Get booking stats
-        context['total_bookings'] = self.get_queryset().count()
-        context['confirmed_bookings'] = self.get_queryset().filter(status='confirmed').count()
-        context['completed_bookings'] = self.get_queryset().filter(status='checked_out').count()
+        stats = get_booking_stats(self.request.user)
+        context['total_bookings'] = stats['total']
+        context['confirmed_bookings'] = stats['confirmed']
+        context['completed_bookings'] = stats['checked_out']
         
         return context
 
@@ -170,6 +313,14 @@ class PaymentView(LoginRequiredMixin, CreateView):
     
     def dispatch(self, request, *args, **kwargs):
         self.booking = get_object_or_404(Booking, id=kwargs['booking_id'], user=request.user)
+        
+        # Entering payment (re)starts the hold on the room nights
+        try:
+            self.hold_expires_at = refresh_hold(self.booking)
+        except RoomUnavailable:
+            messages.error(request, 'Sorry, your hold expired and this room is no longer available for your dates.')
+            return redirect('booking:booking_detail', booking_id=self.booking.id)
+        
         return super().dispatch(request, *args, **kwargs)
     
     def post(self, request, *args, **kwargs):
@@ -250,10 +401,14 @@ class PaymentView(LoginRequiredMixin, CreateView):
         payment.transaction_id = f"TXN{timezone.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:8].upper()}"
         payment.status = 'completed'
         
-        payment.save()
+        # Update booking status; fails if the room was taken in the meantime
+        try:
+            self.booking.confirm_booking()
+        except RoomUnavailable:
+            messages.error(self.request, 'Sorry, this room is no longer available for your dates.')
+            return redirect('booking:booking_detail', booking_id=self.booking.id)
         
-        # Update booking status
-        self.booking.confirm_booking()
+        payment.save()
         
         messages.success(self.request, 'Payment processed successfully!')
         return redirect('booking:booking_detail', booking_id=self.booking.id)
@@ -261,6 +416,7 @@ class PaymentView(LoginRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['booking'] = self.booking
+        context['hold_expires_at'] = self.hold_expires_at
         return context
 
 
@@ -305,9 +461,6 @@ def booking_cancel(request, booking_id):
     if request.method == 'POST':
         form = CancellationForm(request.POST)
         if form.is_valid():
-            booking.status = 'cancelled'
-            booking.cancelled_at = timezone.now()
-            
             # Calculate refund
             policies = booking.hotel.cancellation_policies.filter(is_active=True)
             refund_percentage = 0
@@ -328,7 +481,7 @@ def booking_cancel(request, booking_id):
                 status='completed'
             )
             
-            booking.save()
+            booking.cancel()
             messages.success(request, f'Booking cancelled. Refund amount: {refund_amount}')
             return redirect('booking:booking_list')
     else:
@@ -340,25 +493,30 @@ def booking_cancel(request, booking_id):
     })
 
 
+@staff_member_required
 def booking_search(request):
-    """Search for booking by ID or email"""
-    form = BookingSearchForm()
+    """Search bookings by ID, or by guest email and/or phone prefix (front desk)"""
+    form = BookingSearchForm(request.GET or None)
     bookings = None
+    page_obj = None
     
-    if request.method == 'POST':
-        form = BookingSearchForm(request.POST)
-        if form.is_valid():
-            booking_id = form.cleaned_data.get('booking_id')
-            email = form.cleaned_data.get('email')
-            
-            if booking_id:
-                bookings = Booking.objects.filter(booking_id=booking_id)
-            elif email:
-                bookings = Booking.objects.filter(guest_email=email)
+    if form.is_valid():
+        booking_id = form.cleaned_data.get('booking_id')
+        
+        if booking_id:
+            bookings = Booking.objects.filter(booking_id=booking_id).select_related('room', 'hotel')
+        else:
+            bookings = guest_bookings(form.cleaned_data.get('email'), form.cleaned_data.get('phone'))
+        page_obj = Paginator(bookings, SEARCH_PAGE_SIZE).get_page(request.GET.get('page'))
+        bookings = page_obj.object_list
     
+    query = request.GET.copy()
+    query.pop('page', None)
     return render(request, 'booking/search.html', {
         'form': form,
-        'bookings': bookings
+        'bookings': bookings,
+        'page_obj': page_obj,
+        'query': query.urlencode(),
     })
 
 
@@ -479,7 +637,12 @@ def payment_success(request):
             print(f"[SAVED] Payment status updated to completed")
             
             # Confirm booking
-            booking.confirm_booking()
+            try:
+                booking.confirm_booking()
+            except RoomUnavailable:
+                print(f"[CONFLICT] Room no longer available for booking: {booking.booking_id}")
+                messages.error(request, 'Payment received, but the room is no longer available for your dates. Our team will contact you about a refund.')
+                return redirect('booking:booking_detail', booking_id=booking.id)
             print(f"[CONFIRMED] Booking confirmed")
             
             messages.success(request, 'Payment successful! Your booking is confirmed.')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Hotel, Room, RoomType, HotelFacility, HotelReview, RoomImage, Carousel, CarouselSlide
+from .models import Hotel, Room, RoomType, RoomRate, HotelFacility, HotelReview, RoomImage, Carousel, CarouselSlide
 
 
 @admin.register(Hotel)
@@ -8,7 +8,10 @@ class HotelAdmin(admin.ModelAdmin):
     list_filter = ['status', 'is_featured', 'city', 'created_at']
     search_fields = ['name', 'city', 'description']
     prepopulated_fields = {'slug': ('name',)}
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = [
+        'rating', 'total_reviews', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+        'created_at', 'updated_at',
+    ]
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'slug', 'description', 'email', 'phone')
@@ -25,6 +28,10 @@ class HotelAdmin(admin.ModelAdmin):
         ('Status & Rating', {
             'fields': ('status', 'is_featured', 'rating', 'total_reviews')
         }),
+        ('Rating Histogram', {
+            'fields': ('rating_5', 'rating_4', 'rating_3', 'rating_2', 'rating_1'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -47,6 +54,14 @@ class RoomAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(RoomRate)
+class RoomRateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'room_type', 'room', 'start_date', 'end_date', 'price', 'min_stay', 'priority', 'is_active']
+    list_filter = ['hotel', 'room_type', 'is_active']
+    search_fields = ['name', 'room__room_number', 'room_type__name']
+    date_hierarchy = 'start_date'
+
+
 @admin.register(HotelFacility)
 class HotelFacilityAdmin(admin.ModelAdmin):
     list_display = ['name', 'hotel', 'is_available']
@@ -0,0 +1,114 @@
+"""
+Cache helpers
+Version stamps live in the shared cache and are bumped by signals, so any
+cache key built from them goes stale the moment the underlying data changes.
+A stamp also records when it was created, i.e. when its data last changed.
+LRUCache is a small per-process cache for hot, cheap-to-key values.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+
+VERSION_PREFIX = 'rhms:version:'
+
+
+def _new_stamp():
+    # Creation time in milliseconds (hex) first, so a stamp also tells when its data last changed
+    return f'{int(time.time() * 1000):x}-{uuid.uuid4().hex[:8]}'
+
+
+def stamp_time(stamp):
+    """Unix time at which a stamp was created, or None if it does not carry one"""
+    head, sep, _ = str(stamp).partition('-')
+    if not sep:
+        return None
+    try:
+        return int(head, 16) / 1000
+    except ValueError:
+        return None
+
+
+def get_versions(*names):
+    """Current stamps for the given version names, creating missing ones"""
+    keys = {name: VERSION_PREFIX + name for name in names}
+    found = cache.get_many(list(keys.values()))
+
+    versions = {}
+    for name, key in keys.items():
+        stamp = found.get(key)
+        if stamp is None:
+            # add() so concurrent workers agree on the first stamp
+            cache.add(key, _new_stamp(), None)
+            stamp = cache.get(key)
+        versions[name] = stamp
+    return versions
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump_version(*names):
+    """Invalidate everything keyed on these version names"""
+    cache.set_many({VERSION_PREFIX + name: _new_stamp() for name in names}, None)
+
+
+class LRUCache:
+    """
+    Bounded in-process cache with least-recently-used eviction and a TTL.
+    Thread-safe; counts hits and misses. Entries are per worker process, so
+    keys should embed version stamps to pick up changes made elsewhere.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
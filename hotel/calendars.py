@@ -0,0 +1,113 @@
+"""
+Monthly availability calendar
+Per-day free room count and lowest nightly rate for each room type,
+cached per (hotel, month) and invalidated through version stamps.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.core.cache import cache
+
+from booking.inventory import booked_nights
+from .cache import get_versions, bump_version
+from .pricing import price_grid
+
+
+CALENDAR_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def month_bounds(year, month):
+    """First day of the month and first day of the following month"""
+    first = date(year, month, 1)
+    if month == 12:
+        return first, date(year + 1, 1, 1)
+    return first, date(year, month + 1, 1)
+
+
+def months_between(start, end):
+    """(year, month) pairs touched by the nights in [start, end)"""
+    months = []
+    current = date(start.year, start.month, 1)
+    while current < end:
+        months.append((current.year, current.month))
+        current = month_bounds(current.year, current.month)[1]
+    return months
+
+
+def month_version_name(hotel_id, year, month):
+    return f'calendar:{hotel_id}:{year}-{month:02d}'
+
+
+def rooms_version_name(hotel_id):
+    return f'calendar-rooms:{hotel_id}'
+
+
+def invalidate_months(hotel_id, start, end):
+    """Drop cached calendars for every month a stay touches"""
+    names = [month_version_name(hotel_id, year, month) for year, month in months_between(start, end)]
+    if names:
+        bump_version(*names)
+
+
+def invalidate_rooms(hotel_id):
+    """Room or room type data changed: every month of the hotel is stale"""
+    bump_version(rooms_version_name(hotel_id))
+
+
+def build_month_calendar(hotel, year, month):
+    """Compute the calendar for one month from rooms and the room-night inventory"""
+    first, next_first = month_bounds(year, month)
+    days = [first + timedelta(days=i) for i in range((next_first - first).days)]
+
+    rooms = list(
+        hotel.rooms.filter(is_active=True)
+        .exclude(status__in=['maintenance', 'unavailable'])
+        .only('id', 'room_type_id', 'price_per_night', 'discount_price')
+    )
+    blocked = set(
+        booked_nights(first, next_first, room_id__in=[room.id for room in rooms])
+        .values_list('room_id', 'date')
+    )
+    _, nightly_prices, _ = price_grid(rooms, first, next_first)
+
+    rooms_by_type = defaultdict(list)
+    for room in rooms:
+        rooms_by_type[room.room_type_id].append(room.id)
+
+    room_types = []
+    for room_type in hotel.room_types.order_by('name'):
+        type_rooms = rooms_by_type.get(room_type.id, [])
+        calendar_days = []
+        for i, day in enumerate(days):
+            prices = [nightly_prices[room_id][i] for room_id in type_rooms if (room_id, day) not in blocked]
+            calendar_days.append({
+                'date': day.isoformat(),
+                'available': len(prices),
+                'lowest_price': str(min(prices)) if prices else None,
+            })
+        room_types.append({
+            'id': room_type.id,
+            'name': room_type.name,
+            'days': calendar_days,
+        })
+
+    return {
+        'hotel': hotel.id,
+        'month': f'{year}-{month:02d}',
+        'room_types': room_types,
+    }
+
+
+def get_month_calendar(hotel, year, month):
+    """Cached calendar; rebuilt only after a booking or room touching the month changes"""
+    month_name = month_version_name(hotel.id, year, month)
+    rooms_name = rooms_version_name(hotel.id)
+    versions = get_versions(month_name, rooms_name)
+
+    key = f'rhms:calendar:{hotel.id}:{year}-{month:02d}:{versions[month_name]}:{versions[rooms_name]}'
+    calendar = cache.get(key)
+    if calendar is None:
+        calendar = build_month_calendar(hotel, year, month)
+        cache.set(key, calendar, CALENDAR_CACHE_TIMEOUT)
+    return calendar
@@ -0,0 +1,84 @@
+"""
+Default hotel
+The single hotel this site serves is loaded once per worker process, with
+its room types and available facilities, and reused until its version
+stamp in the shared cache changes. A warm request reads one stamp and no
+database rows. Stamps only reach every worker through a cache backend the
+processes share; see CACHES in the settings.
+"""
+
+import copy
+import threading
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import Http404
+
+from .cache import get_version, bump_version
+from .models import Hotel, HotelFacility
+
+
+def hotel_version_name(hotel_id):
+    return f'hotel:{hotel_id}'
+
+
+def invalidate_hotel(hotel_id):
+    """Hotel, room type or facility data changed: every worker reloads the hotel"""
+    bump_version(hotel_version_name(hotel_id))
+
+
+class HotelCache:
+    """
+    Per-process copy of one hotel, refreshed when its version stamp moves.
+    Without a hotel_id it follows settings.DEFAULT_HOTEL_ID, read on each get().
+    """
+
+    def __init__(self, hotel_id=None):
+        self._hotel_id = hotel_id
+        self.loads = 0
+        self._entry = None
+        self._lock = threading.Lock()
+
+    @property
+    def hotel_id(self):
+        return self._hotel_id if self._hotel_id is not None else settings.DEFAULT_HOTEL_ID
+
+    def load(self, hotel_id):
+        try:
+            return Hotel.objects.prefetch_related(
+                'room_types',
+                Prefetch(
+                    'facilities',
+                    queryset=HotelFacility.objects.filter(is_available=True),
+                    to_attr='available_facilities',
+                ),
+            ).get(id=hotel_id)
+        except Hotel.DoesNotExist:
+            raise Http404("No Hotel matches the given query.")
+
+    def get(self):
+        # Read the stamp before loading: a change made mid-load leaves an
+        # entry tagged with the old stamp, which the next request replaces
+        hotel_id = self.hotel_id
+        key = (hotel_id, get_version(hotel_version_name(hotel_id)))
+        entry = self._entry
+        if entry is None or entry[0] != key:
+            with self._lock:
+                entry = self._entry
+                if entry is None or entry[0] != key:
+                    entry = (key, self.load(hotel_id))
+                    self._entry = entry
+                    self.loads += 1
+        # Requests get their own copy so attribute changes do not leak across them
+        return copy.copy(entry[1])
+
+    def clear(self):
+        self._entry = None
+
+
+default_hotel_cache = HotelCache()
+
+
+def get_default_hotel():
+    """The hotel of this single-hotel setup; raises Http404 if it is missing"""
+    return default_hotel_cache.get()
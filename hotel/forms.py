@@ -32,6 +32,19 @@ class HotelSearchForm(forms.Form):
             'min': '1'
         })
     )
+    flexible_days = forms.TypedChoiceField(
+        label="Flexible Dates",
+        required=False,
+        coerce=int,
+        empty_value=0,
+        choices=[
+            (0, 'Exact dates'),
+            (1, '± 1 day'),
+            (3, '± 3 days'),
+            (7, '± 7 days'),
+        ],
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
     
     def clean(self):
         cleaned_data = super().clean()
@@ -45,6 +58,29 @@ class HotelSearchForm(forms.Form):
         return cleaned_data
 
 
+class GroupSearchForm(HotelSearchForm):
+    """Form for finding several rooms for one group"""
+    rooms = forms.IntegerField(
+        min_value=1,
+        max_value=200,
+        label="Number of Rooms",
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '1'
+        })
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        rooms = cleaned_data.get('rooms')
+        guests = cleaned_data.get('guests')
+        
+        if rooms and guests and guests < rooms:
+            raise ValidationError("Every room needs at least one guest.")
+        
+        return cleaned_data
+
+
 class HotelReviewForm(forms.ModelForm):
     """Form for creating hotel reviews"""
     class Meta:
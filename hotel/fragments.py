@@ -0,0 +1,26 @@
+"""
+Template fragment versions
+Each cached section of the home page varies on the version stamp of the
+data it renders. Signals bump the stamps, so a fragment is never served
+after its data changed and no short TTL is needed.
+"""
+
+from .cache import get_versions, bump_version
+
+
+SECTIONS = ('hero', 'carousel', 'facilities', 'room_types', 'reviews')
+
+
+def section_version_name(hotel_id, section):
+    return f'fragment:{section}:{hotel_id}'
+
+
+def invalidate_sections(hotel_id, *sections):
+    bump_version(*[section_version_name(hotel_id, section) for section in sections])
+
+
+def section_versions(hotel_id):
+    """{section: stamp} for every home page section, read in one cache call"""
+    names = {section: section_version_name(hotel_id, section) for section in SECTIONS}
+    versions = get_versions(*names.values())
+    return {section: versions[name] for section, name in names.items()}
@@ -0,0 +1,184 @@
+"""
+Responsive image derivatives
+After an upload commits, a background thread writes WebP and JPEG copies
+of the image at each of IMAGE_DERIVATIVE_WIDTHS (never wider than the
+original) and records them as ImageDerivative rows with their dimensions.
+Templates turn those rows into srcset/sizes markup, loading the rows of a
+whole list of images at once (prefetch_derivatives). Derivatives are keyed
+by the original's storage name, which changes with every upload, so they
+never go stale and can be cached per process indefinitely.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .cache import LRUCache
+from .models import ImageDerivative
+
+
+logger = logging.getLogger(__name__)
+
+# format -> (Pillow format, file extension, save options)
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+EXIF_ORIENTATION = 0x0112
+
+# Found derivatives never change; missing ones are re-checked after a minute
+derivative_cache = LRUCache(maxsize=10000, ttl=60 * 60 * 24)
+missing_derivative_cache = LRUCache(maxsize=10000, ttl=60)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def derivative_name(source, fmt, width):
+    stem = os.path.splitext(source)[0]
+    return f'derivatives/{stem}-{width}w.{DERIVATIVE_FORMATS[fmt][1]}'
+
+
+def target_widths(width, widths=None):
+    """Derivative widths for an image this wide; the largest is capped at the original"""
+    widths = widths or settings.IMAGE_DERIVATIVE_WIDTHS
+    return sorted({min(target, width) for target in widths})
+
+
+def open_for_resize(file, largest_width):
+    """
+    Decode an image upright in RGB. JPEGs are decoded at a reduced scale
+    that still covers largest_width (Pillow draft mode), which caps memory
+    and decoding time on huge uploads.
+    """
+    image = Image.open(file)
+    # Request a square box so the draft stays large enough after an EXIF rotation
+    image.draft('RGB', (largest_width, largest_width))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def generate_derivatives(source, widths=None):
+    """
+    Write and record every derivative of one stored image; returns the new
+    rows. widths defaults to IMAGE_DERIVATIVE_WIDTHS.
+    """
+    if not source or ImageDerivative.objects.filter(source=source).exists():
+        return []
+    if not default_storage.exists(source):
+        return []
+
+    with default_storage.open(source) as file:
+        with Image.open(file) as probe:
+            width, height = probe.size
+            if probe.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+                width, height = height, width
+        widths = target_widths(width, widths)
+        file.seek(0)
+        image = open_for_resize(file, widths[-1])
+
+    rows = []
+    for target in widths:
+        target_height = max(1, round(height * target / width))
+        resized = image.resize((target, target_height), Image.Resampling.LANCZOS)
+        for fmt, (pil_format, _, options) in DERIVATIVE_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = default_storage.save(derivative_name(source, fmt, target), ContentFile(buffer.getvalue()))
+            rows.append(ImageDerivative(source=source, format=fmt, file=name, width=target, height=target_height))
+
+    ImageDerivative.objects.bulk_create(rows, ignore_conflicts=True)
+    missing_derivative_cache.delete(source)
+    return rows
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS, thread_name_prefix='image-derivatives'
+            )
+        return _executor
+
+
+def run_derivatives(sources, on_done=None, widths=None):
+    try:
+        created = [source for source in sources if generate_derivatives(source, widths)]
+        if created and on_done is not None:
+            on_done()
+    except Exception:
+        logger.exception("Generating image derivatives failed for %s", sources)
+
+
+def run_derivatives_in_worker(sources, on_done=None, widths=None):
+    try:
+        run_derivatives(sources, on_done, widths)
+    finally:
+        # Each worker thread opens its own connection; do not leave it open
+        connection.close()
+
+
+def schedule_derivatives(sources, on_done=None, widths=None):
+    """
+    Generate derivatives of the given storage names once the current
+    transaction commits, in a worker thread unless IMAGE_DERIVATIVES_ASYNC
+    is off. on_done runs after new derivatives were written, e.g. to purge
+    cached pages that still reference the originals. widths overrides
+    IMAGE_DERIVATIVE_WIDTHS, e.g. for thumbnails.
+    """
+    sources = [source for source in sources if source]
+    if not sources:
+        return
+
+    def submit():
+        if settings.IMAGE_DERIVATIVES_ASYNC:
+            get_executor().submit(run_derivatives_in_worker, sources, on_done, widths)
+        else:
+            run_derivatives(sources, on_done, widths)
+
+    transaction.on_commit(submit)
+
+
+def prefetch_derivatives(sources):
+    """
+    Load the derivatives of every uncached storage name in one query and
+    cache them, so a page rendering many images does not query per image.
+    """
+    sources = {
+        source for source in sources
+        if source and derivative_cache.get(source) is None and not missing_derivative_cache.get(source)
+    }
+    if not sources:
+        return
+
+    found = {}
+    for source, fmt, width, height, name in (
+        ImageDerivative.objects.filter(source__in=sources).order_by('width')
+        .values_list('source', 'format', 'width', 'height', 'file')
+    ):
+        found.setdefault(source, {}).setdefault(fmt, []).append((width, height, default_storage.url(name)))
+
+    for source in sources:
+        if source in found:
+            derivative_cache.set(source, found[source])
+        else:
+            missing_derivative_cache.set(source, True)
+
+
+def get_derivatives(source):
+    """{format: [(width, height, url), ...]} of one stored image, narrowest first"""
+    if not source:
+        return {}
+    prefetch_derivatives([source])
+    return derivative_cache.get(source) or {}
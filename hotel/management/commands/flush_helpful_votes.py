@@ -0,0 +1,29 @@
+"""
+Management command to add buffered helpful votes to review helpful counts.
+Usage: python manage.py flush_helpful_votes [--interval SECONDS] [--batch-size N]
+Run it from cron, or once with --interval to keep flushing until stopped.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from hotel.votes import flush_helpful_votes, FLUSH_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Flush pending review helpful votes into HotelReview.helpful_count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep running, flushing every SECONDS')
+        parser.add_argument('--batch-size', type=int, default=FLUSH_BATCH_SIZE, help='Votes counted per transaction')
+
+    def handle(self, *args, **options):
+        while True:
+            votes, reviews = flush_helpful_votes(options['batch_size'])
+            if votes or not options['interval']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'✓ Flushed {votes} helpful votes into {reviews} review updates')
+                )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+"""
+Management command to generate responsive derivatives for existing images.
+Usage: python manage.py generate_image_derivatives
+New uploads are processed automatically; this backfills older ones.
+"""
+
+from django.core.management.base import BaseCommand
+from hotel.images import generate_derivatives
+from hotel.signals import IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Generate WebP/JPEG derivatives for hotel, room type, room and carousel images'
+
+    def handle(self, *args, **options):
+        sources = set()
+        for model, fields in IMAGE_FIELDS.items():
+            for names in model.objects.values_list(*fields):
+                sources.update(name for name in names if name)
+
+        generated = failed = 0
+        for source in sorted(sources):
+            try:
+                if generate_derivatives(source):
+                    generated += 1
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'  Skipped {source}: {exc}'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Generated derivatives for {generated} of {len(sources)} images ({failed} failed)')
+        )
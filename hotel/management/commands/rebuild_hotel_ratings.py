@@ -0,0 +1,27 @@
+"""
+Management command to rebuild hotel rating summaries from their reviews.
+Usage: python manage.py rebuild_hotel_ratings [--hotel ID]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from hotel.models import Hotel
+from hotel.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute review count, rating sum and star histogram of hotels in one pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotel', type=int, help='Only rebuild this hotel')
+
+    def handle(self, *args, **options):
+        hotels = Hotel.objects.all()
+        if options['hotel']:
+            hotels = hotels.filter(id=options['hotel'])
+            if not hotels.exists():
+                raise CommandError(f'Hotel with ID {options["hotel"]} does not exist')
+
+        repaired = rebuild_ratings(hotels)
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Rebuilt rating summaries of {hotels.count()} hotels ({repaired} repaired)')
+        )
@@ -0,0 +1,35 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0003_seo_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(help_text='Last night the rate applies to')),
+                ('weekdays', models.CharField(blank=True, help_text='Comma-separated weekdays (0=Monday ... 6=Sunday); leave blank for every day', max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_stay', models.PositiveIntegerField(default=1, help_text='Minimum nights for stays arriving on these dates')),
+                ('priority', models.IntegerField(default=0, help_text='Higher priority wins where rates overlap')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hotel', models.ForeignKey(blank=True, on_delete=django.db.models.deletion.CASCADE, related_name='room_rates', to='hotel.hotel')),
+                ('room', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='hotel.room')),
+                ('room_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='hotel.roomtype')),
+            ],
+            options={
+                'ordering': ['start_date', '-priority'],
+                'indexes': [models.Index(fields=['hotel', 'end_date'], name='hotel_roomr_hotel_i_a96f33_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_rating_summary(apps, schema_editor):
+    Hotel = apps.get_model('hotel', 'Hotel')
+    HotelReview = apps.get_model('hotel', 'HotelReview')
+    summaries = HotelReview.objects.values('hotel').annotate(
+        total=Count('id'),
+        rating_sum=Sum('rating'),
+        **{f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)},
+    )
+    for summary in summaries:
+        Hotel.objects.filter(pk=summary['hotel']).update(
+            total_reviews=summary['total'],
+            rating=summary['rating_sum'],
+            **{f'rating_{stars}': summary[f'stars_{stars}'] for stars in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0004_room_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotel',
+            name='rating_1',
+            field=models.IntegerField(default=0, help_text='Number of 1-star reviews'),
+        ),
+        migrations.AddField(
+            model_name='hotel',
+            name='rating_2',
+            field=models.IntegerField(default=0, help_text='Number of 2-star reviews'),
+        ),
+        migrations.AddField(
+            model_name='hotel',
+            name='rating_3',
+            field=models.IntegerField(default=0, help_text='Number of 3-star reviews'),
+        ),
+        migrations.AddField(
+            model_name='hotel',
+            name='rating_4',
+            field=models.IntegerField(default=0, help_text='Number of 4-star reviews'),
+        ),
+        migrations.AddField(
+            model_name='hotel',
+            name='rating_5',
+            field=models.IntegerField(default=0, help_text='Number of 5-star reviews'),
+        ),
+        migrations.AlterField(
+            model_name='hotel',
+            name='rating',
+            field=models.FloatField(default=0, help_text='Sum of review ratings', validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.RunPython(fill_rating_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0005_rating_histogram'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hotelreview',
+            index=models.Index(fields=['hotel', '-created_at', '-id'], name='review_feed_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotelreview',
+            index=models.Index(fields=['hotel', 'rating', '-created_at', '-id'], name='review_feed_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotelreview',
+            index=models.Index(fields=['hotel', '-helpful_count', '-created_at', '-id'], name='review_feed_helpful_idx'),
+        ),
+    ]
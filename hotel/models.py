@@ -1,10 +1,38 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from datetime import timedelta
 
-class Hotel(models.Model):
+# Hotel fields written only by hotel/ratings.py, or by a save that names them in update_fields
+RATING_SUMMARY_FIELDS = ('rating', 'total_reviews', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+
+
+class StoredImagesMixin:
+    """Remembers the stored name of each image field as loaded from the database"""
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Derivatives are only rendered for a new upload, not on every save
+        deferred = instance.get_deferred_fields()
+        instance._image_names = {
+            field.name: getattr(instance, field.name).name
+            for field in cls._meta.concrete_fields
+            if isinstance(field, models.ImageField) and field.attname not in deferred
+        }
+        return instance
+    
+    def new_image_names(self, fields):
+        """Storage names of the given image fields that changed since load or the last call"""
+        stored = getattr(self, '_image_names', {})
+        names = [getattr(self, field).name for field in fields]
+        changed = [name for field, name in zip(fields, names) if name and name != stored.get(field)]
+        self._image_names = {**stored, **dict(zip(fields, names))}
+        return changed
+
+
+class Hotel(StoredImagesMixin, models.Model):
     """Main hotel model"""
     STATUS_CHOICES = [
         ('active', 'Active'),
@@ -26,11 +54,14 @@ class Hotel(models.Model):
     longitude = models.FloatField(null=True, blank=True)
     image = models.ImageField(upload_to='hotels/')
     banner = models.ImageField(upload_to='hotels/banners/')
-    rating = models.FloatField(
-        default=0,
-        validators=[MinValueValidator(0), MaxValueValidator(5)]
-    )
+    # Rating summary, maintained by signals from HotelReview (see hotel/ratings.py)
+    rating = models.FloatField(default=0, validators=[MinValueValidator(0)], help_text="Sum of review ratings")
     total_reviews = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0, help_text="Number of 1-star reviews")
+    rating_2 = models.IntegerField(default=0, help_text="Number of 2-star reviews")
+    rating_3 = models.IntegerField(default=0, help_text="Number of 3-star reviews")
+    rating_4 = models.IntegerField(default=0, help_text="Number of 4-star reviews")
+    rating_5 = models.IntegerField(default=0, help_text="Number of 5-star reviews")
     check_in_time = models.TimeField(default='14:00')
     check_out_time = models.TimeField(default='11:00')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
@@ -53,13 +84,32 @@ class Hotel(models.Model):
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        # The rating summary only moves through F() updates (hotel/ratings.py);
+        # saving an older copy of the hotel must not write stale counts back
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in RATING_SUMMARY_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
     def get_average_rating(self):
         if self.total_reviews > 0:
             return round(self.rating / self.total_reviews, 1)
         return 0
 
+    def get_rating_histogram(self):
+        """(stars, count, percent) from 5 stars down to 1"""
+        histogram = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'rating_{stars}')
+            percent = round(100 * count / self.total_reviews) if self.total_reviews else 0
+            histogram.append((stars, count, percent))
+        return histogram
+
 
-class RoomType(models.Model):
+class RoomType(StoredImagesMixin, models.Model):
     """Room types available at hotels"""
     hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='room_types')
     name = models.CharField(max_length=100)  # Single, Double, Suite, etc.
@@ -119,14 +169,74 @@ class Room(models.Model):
         """Get current price (discount or regular)"""
         return self.discount_price if self.discount_price else self.price_per_night
     
+    @property
+    def primary_image(self):
+        """First gallery image; served from room_images_prefetch() when the view used it"""
+        images = getattr(self, 'gallery', None)
+        if images is None:
+            return self.images.order_by('id').first()
+        return images[0] if images else None
+    
     def is_available(self, check_in, check_out):
         """Check if room is available for given dates"""
-        from booking.models import Booking
-        bookings = Booking.objects.filter(
-            room=self,
-            status__in=['confirmed', 'checked_in']
-        ).exclude(check_out_date__lte=check_in).exclude(check_in_date__gte=check_out)
-        return not bookings.exists()
+        from booking.inventory import is_room_available
+        return is_room_available(self, check_in, check_out)
+
+
+class RoomRate(models.Model):
+    """Nightly price override for a room type or a single room over a date range"""
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, blank=True, related_name='room_rates')
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, null=True, blank=True, related_name='rates')
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, null=True, blank=True, related_name='rates')
+    name = models.CharField(max_length=100)  # High season, Weekend, etc.
+    start_date = models.DateField()
+    end_date = models.DateField(help_text="Last night the rate applies to")
+    weekdays = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text="Comma-separated weekdays (0=Monday ... 6=Sunday); leave blank for every day"
+    )
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    min_stay = models.PositiveIntegerField(default=1, help_text="Minimum nights for stays arriving on these dates")
+    priority = models.IntegerField(default=0, help_text="Higher priority wins where rates overlap")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['start_date', '-priority']
+        indexes = [
+            models.Index(fields=['hotel', 'end_date']),
+        ]
+    
+    def __str__(self):
+        target = self.room or self.room_type
+        return f"{self.name} - {target} ({self.start_date} to {self.end_date})"
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if bool(self.room_id) == bool(self.room_type_id):
+            raise ValidationError("Set either a room type or a room.")
+        if self.end_date and self.start_date and self.end_date < self.start_date:
+            raise ValidationError("End date must not be before start date.")
+        try:
+            self.get_weekdays()
+        except ValueError:
+            raise ValidationError("Weekdays must be numbers from 0 to 6.")
+    
+    def save(self, *args, **kwargs):
+        if not self.hotel_id:
+            self.hotel_id = (self.room or self.room_type).hotel_id
+        super().save(*args, **kwargs)
+    
+    def get_weekdays(self):
+        """Set of weekday numbers the rate applies to, or None for every day"""
+        if not self.weekdays.strip():
+            return None
+        days = {int(day) for day in self.weekdays.split(',') if day.strip()}
+        if not days <= set(range(7)):
+            raise ValueError(self.weekdays)
+        return days
 
 
 class HotelFacility(models.Model):
@@ -161,12 +271,57 @@ class HotelReview(models.Model):
     class Meta:
         unique_together = ['hotel', 'user']
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the review feed, one index per sort (see hotel/reviews.py)
+            models.Index(fields=['hotel', '-created_at', '-id'], name='review_feed_recent_idx'),
+            models.Index(fields=['hotel', 'rating', '-created_at', '-id'], name='review_feed_rating_idx'),
+            models.Index(fields=['hotel', '-helpful_count', '-created_at', '-id'], name='review_feed_helpful_idx'),
+        ]
     
     def __str__(self):
         return f"{self.hotel.name} - {self.user.username} ({self.rating}★)"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the counted rating so edits move the hotel summary by the difference
+        if instance.get_deferred_fields().isdisjoint(['hotel_id', 'rating']):
+            instance._rating_state = instance.get_rating_state()
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from .ratings import apply_rating_change
+        current_state = self.get_rating_state()
+        
+        # The review row and the hotel's summary change together or not at all
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            apply_rating_change(getattr(self, '_rating_state', None), current_state)
+        self._rating_state = current_state
+    
+    def get_rating_state(self):
+        """Hotel and star rating this review contributes to the hotel's summary"""
+        return (self.hotel_id, self.rating)
+
 
+class ReviewHelpfulVote(models.Model):
+    """A user's 'helpful' vote on a review; counted into helpful_count in batches"""
+    review = models.ForeignKey(HotelReview, on_delete=models.CASCADE, related_name='helpful_votes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='helpful_votes')
+    counted = models.BooleanField(default=False, help_text="Already added to the review's helpful_count")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['review', 'user']
+        indexes = [
+            models.Index(fields=['review'], condition=models.Q(counted=False), name='helpful_vote_pending_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} found review {self.review_id} helpful"
 
-class RoomImage(models.Model):
+
+class RoomImage(StoredImagesMixin, models.Model):
     """Additional images for rooms"""
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='rooms/')
@@ -176,6 +331,33 @@ class RoomImage(models.Model):
     def __str__(self):
         return f"Image for {self.room}"
 
+
+class ImageDerivative(models.Model):
+    """Resized copy of an uploaded image, generated by hotel/images.py"""
+    FORMAT_CHOICES = [
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+    
+    source = models.CharField(max_length=255, help_text="Storage name of the original image")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    file = models.ImageField(upload_to='derivatives/', max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['source', 'format', 'width']
+        ordering = ['source', 'format', 'width']
+    
+    def __str__(self):
+        return f"{self.source} ({self.format}, {self.width}w)"
+
+
+def room_images_prefetch():
+    """Prefetch rooms' images into room.gallery, oldest first, for Room.primary_image"""
+    return models.Prefetch('images', queryset=RoomImage.objects.order_by('id'), to_attr='gallery')
+
 class Carousel(models.Model):
     """Carousel slides for homepage"""
     hotel = models.OneToOneField(Hotel, on_delete=models.CASCADE, related_name='carousel')
@@ -194,7 +376,7 @@ class Carousel(models.Model):
         return self.slides.filter(is_active=True).order_by('order')
 
 
-class CarouselSlide(models.Model):
+class CarouselSlide(StoredImagesMixin, models.Model):
     """Individual carousel slides"""
     carousel = models.ForeignKey(Carousel, on_delete=models.CASCADE, related_name='slides')
     title = models.CharField(max_length=200)
@@ -0,0 +1,185 @@
+"""
+Anonymous full-page cache
+Public pages are identical for every anonymous visitor, so their rendered
+responses are stored in the shared cache under the version stamps of the
+data they show. Signals bump those stamps, which purges exactly the pages
+that changed. Logged-in users, non-GET requests and requests with pending
+messages always run the view.
+
+Pages with forms carry a CSRF token. It is stored as a placeholder and each
+cache hit gets a token of its own, so cached forms keep working.
+
+The stamps double as HTTP validators: repeat visitors and crawlers sending
+If-None-Match get a 304 without a render. Last-Modified is informational
+only; it has one-second resolution, so two changes within a second would
+share it and an If-Modified-Since alone never yields a 304.
+"""
+
+import hashlib
+import math
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from booking.inventory import requested_ranges
+from .cache import get_versions, bump_version, stamp_time
+from .calendars import months_between, month_version_name
+from .defaults import hotel_version_name
+from .fragments import section_version_name
+from .models import Room
+
+
+PAGE_KEY_PREFIX = 'rhms:page:'
+CSRF_PLACEHOLDER = '__rhms_csrf_token__'
+CSRF_INPUT = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+SITEMAP_VERSION_NAME = 'page-sitemap'
+
+
+def rooms_page_version_name(hotel_id):
+    return f'page-rooms:{hotel_id}'
+
+
+def invalidate_room_pages(hotel_id):
+    """Room or room image changed: pages listing the hotel's rooms are stale"""
+    bump_version(rooms_page_version_name(hotel_id), SITEMAP_VERSION_NAME)
+
+
+def invalidate_sitemap():
+    bump_version(SITEMAP_VERSION_NAME)
+
+
+def home_page_versions(request, **kwargs):
+    hotel_id = settings.DEFAULT_HOTEL_ID
+    return [
+        hotel_version_name(hotel_id),
+        rooms_page_version_name(hotel_id),
+        section_version_name(hotel_id, 'reviews'),
+        section_version_name(hotel_id, 'carousel'),
+    ]
+
+
+def hotel_page_versions(request, **kwargs):
+    hotel_id = settings.DEFAULT_HOTEL_ID
+    return [
+        hotel_version_name(hotel_id),
+        rooms_page_version_name(hotel_id),
+        section_version_name(hotel_id, 'reviews'),
+    ]
+
+
+def room_page_versions(request, pk, **kwargs):
+    """Room pages show the hotel's other rooms; with dates, also the room's availability"""
+    hotel_id = Room.objects.filter(pk=pk).values_list('hotel_id', flat=True).first()
+    if hotel_id is None:
+        return None
+    names = [hotel_version_name(hotel_id), rooms_page_version_name(hotel_id)]
+
+    try:
+        ranges = requested_ranges(request.GET)
+    except ValueError:
+        # The page shows no availability for invalid dates
+        ranges = []
+    months = set()
+    for check_in, check_out in ranges:
+        months.update(months_between(check_in, check_out))
+    names += [month_version_name(hotel_id, year, month) for year, month in sorted(months)]
+    return names
+
+
+def sitemap_versions(request, **kwargs):
+    return [SITEMAP_VERSION_NAME]
+
+
+def is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pending messages are shown once, on whichever page renders them next
+    return not len(get_messages(request))
+
+
+def is_cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not response.has_header('Cache-Control')
+    )
+
+
+def page_digest(request, stamps):
+    raw = '|'.join([request.get_full_path(), *stamps])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def page_last_modified(stamps):
+    """Latest change time of the page's data, or None if a stamp carries no time"""
+    times = [stamp_time(stamp) for stamp in stamps]
+    if not times or None in times:
+        return None
+    # Round up: a change within the same second must not look older than the response
+    return math.ceil(max(times))
+
+
+def cache_public_page(version_names):
+    """
+    Cache an anonymous GET response. version_names(request, **kwargs)
+    returns the version names the page depends on, or None when this
+    request must not be cached.
+
+    The same stamps give the page its ETag, so a request revalidating an
+    unchanged page gets a 304 before any cache lookup or rendering.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            names = version_names(request, **kwargs) if is_cacheable_request(request) else None
+            if names is None:
+                return view_func(request, *args, **kwargs)
+
+            versions = get_versions(*names)
+            stamps = [versions[name] for name in names]
+            digest = page_digest(request, stamps)
+            etag = quote_etag(digest)
+            last_modified = page_last_modified(stamps)
+
+            # Only the ETag validates: the second-rounded date could hide a change
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            key = PAGE_KEY_PREFIX + digest
+            cached = cache.get(key)
+            if cached is not None:
+                headers, content = cached
+                if CSRF_PLACEHOLDER in content:
+                    content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+                response = HttpResponse(content, headers=headers)
+                response['X-Page-Cache'] = 'hit'
+            else:
+                response = view_func(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response = response.render()
+                if not is_cacheable_response(response):
+                    return response
+                content = CSRF_INPUT.sub(
+                    rf'\g<1>{CSRF_PLACEHOLDER}\g<2>',
+                    response.content.decode(response.charset),
+                )
+                cache.set(key, (dict(response.headers), content), settings.PAGE_CACHE_TIMEOUT)
+                response['X-Page-Cache'] = 'miss'
+
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
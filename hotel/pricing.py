@@ -0,0 +1,164 @@
+"""
+Rate calendar and quote engine
+Resolves the nightly price and minimum stay of many rooms over a date span
+from a single RoomRate query, then prices every requested stay by slicing
+those per-day grids. Rooms without a matching rate fall back to
+Room.get_price(). Single-stay quotes for the booking form are memoized per
+worker process in quote_cache.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import RoomRate
+from .cache import LRUCache, get_version, bump_version
+
+
+CENT = Decimal('0.01')
+
+quote_cache = LRUCache(maxsize=settings.QUOTE_CACHE_SIZE, ttl=settings.QUOTE_CACHE_TIMEOUT)
+
+
+class Quote(namedtuple('Quote', ['room_id', 'check_in', 'check_out', 'nightly_prices', 'subtotal', 'tax', 'total', 'min_stay'])):
+    """Price of one stay; min_stay is the minimum nights required for its arrival date"""
+    __slots__ = ()
+
+    @property
+    def nights(self):
+        return len(self.nightly_prices)
+
+    @property
+    def nightly_rate(self):
+        """Average price per night"""
+        return (self.subtotal / self.nights).quantize(CENT) if self.nights else self.subtotal
+
+    @property
+    def meets_min_stay(self):
+        return self.nights >= self.min_stay
+
+
+def tax_rate():
+    """BOOKING_TAX_RATE as a Decimal, read on every call so setting changes apply"""
+    return Decimal(str(settings.BOOKING_TAX_RATE))
+
+
+def compute_tax(subtotal):
+    return (subtotal * tax_rate()).quantize(CENT)
+
+
+def price_grid(rooms, start, end):
+    """
+    Nightly prices and minimum stays for the nights in [start, end).
+    Returns (days, prices, min_stays) where prices[room_id] and
+    min_stays[room_id] hold one entry per day.
+
+    Room rates override room type rates; among rates of the same level the
+    higher priority, then the later start date, wins.
+    """
+    rooms = list(rooms)
+    days = [start + timedelta(days=i) for i in range((end - start).days)]
+    prices = {room.id: [Decimal(str(room.get_price()))] * len(days) for room in rooms}
+    min_stays = {room.id: [1] * len(days) for room in rooms}
+    if not rooms or not days:
+        return days, prices, min_stays
+
+    rooms_by_type = {}
+    for room in rooms:
+        rooms_by_type.setdefault(room.room_type_id, []).append(room.id)
+
+    rates = RoomRate.objects.filter(
+        Q(room_id__in=list(prices)) | Q(room_type_id__in=[type_id for type_id in rooms_by_type if type_id]),
+        is_active=True,
+        start_date__lt=end,
+        end_date__gte=start,
+    )
+    # Apply the weakest rates first so stronger ones overwrite them
+    rates = sorted(rates, key=lambda rate: (rate.room_id is not None, rate.priority, rate.start_date, rate.id))
+
+    for rate in rates:
+        room_ids = [rate.room_id] if rate.room_id else rooms_by_type.get(rate.room_type_id, [])
+        weekdays = rate.get_weekdays()
+        first = max((rate.start_date - start).days, 0)
+        last = min((rate.end_date - start).days + 1, len(days))
+        for i in range(first, last):
+            if weekdays is not None and days[i].weekday() not in weekdays:
+                continue
+            for room_id in room_ids:
+                prices[room_id][i] = rate.price
+                min_stays[room_id][i] = rate.min_stay
+
+    return days, prices, min_stays
+
+
+def quote_stays(stays):
+    """
+    Price many (room, check_in, check_out) stays with one query.
+    Returns one Quote per stay, in order.
+    """
+    stays = list(stays)
+    if not stays:
+        return []
+
+    start = min(check_in for _, check_in, _ in stays)
+    end = max(check_out for _, _, check_out in stays)
+    rooms = {room.id: room for room, _, _ in stays}
+    _, prices, min_stays = price_grid(rooms.values(), start, end)
+
+    quotes = []
+    for room, check_in, check_out in stays:
+        first, last = (check_in - start).days, (check_out - start).days
+        nightly_prices = prices[room.id][first:last]
+        subtotal = sum(nightly_prices, Decimal('0'))
+        tax = compute_tax(subtotal)
+        quotes.append(Quote(
+            room_id=room.id,
+            check_in=check_in,
+            check_out=check_out,
+            nightly_prices=nightly_prices,
+            subtotal=subtotal,
+            tax=tax,
+            total=subtotal + tax,
+            min_stay=min_stays[room.id][first] if last > first else 1,
+        ))
+    return quotes
+
+
+def quote_stay(room, check_in, check_out):
+    """Price a single stay"""
+    return quote_stays([(room, check_in, check_out)])[0]
+
+
+def quote_rooms(rooms, check_in, check_out):
+    """{room_id: Quote} for the same stay in every room, e.g. a search results page"""
+    return {quote.room_id: quote for quote in quote_stays((room, check_in, check_out) for room in rooms)}
+
+
+def rates_version_name(hotel_id):
+    return f'rates:{hotel_id}'
+
+
+def invalidate_rates(hotel_id):
+    """Rates of the hotel changed: every cached quote is stale"""
+    bump_version(rates_version_name(hotel_id))
+
+
+def cached_quote(room, check_in, check_out):
+    """
+    quote_stay() memoized in quote_cache. The key carries the room's own
+    prices, the tax rate and the hotel's rate version, so a price edit or a
+    rate change misses naturally; a hit reads one version stamp and no
+    database rows.
+    """
+    key = (
+        room.id, check_in, check_out, room.price_per_night, room.discount_price, tax_rate(),
+        get_version(rates_version_name(room.hotel_id)),
+    )
+    quote = quote_cache.get(key)
+    if quote is None:
+        quote = quote_stay(room, check_in, check_out)
+        quote_cache.set(key, quote)
+    return quote
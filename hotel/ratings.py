@@ -0,0 +1,102 @@
+"""
+Hotel rating summary
+Each hotel keeps the count, sum and 1-5 star histogram of its reviews.
+Review saves and deletes move them with single UPDATE statements built
+from F() expressions in the same transaction, so concurrent reviews never
+overwrite each other and pages read ratings straight off the hotel row.
+Hotel.save() leaves these fields out unless update_fields names them.
+rebuild_ratings() recomputes the summary from the reviews table in one
+grouped query.
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .defaults import invalidate_hotel
+from .fragments import invalidate_sections
+from .models import Hotel, HotelReview
+
+
+STARS = range(1, 6)
+
+
+def star_field(stars):
+    return f'rating_{stars}'
+
+
+def summary_changes(state, sign):
+    """{field: delta} for adding (sign=1) or removing (sign=-1) one rating"""
+    _, stars = state
+    return {'total_reviews': sign, 'rating': sign * stars, star_field(stars): sign}
+
+
+def apply_rating_change(previous_state, current_state):
+    """
+    Move the summaries of the affected hotels from previous_state to
+    current_state; either may be None for a created or deleted review.
+    """
+    if previous_state == current_state:
+        return
+
+    changes = {}
+    for state, sign in ((previous_state, -1), (current_state, 1)):
+        if state is None:
+            continue
+        hotel_changes = changes.setdefault(state[0], {})
+        for field, delta in summary_changes(state, sign).items():
+            hotel_changes[field] = hotel_changes.get(field, 0) + delta
+
+    for hotel_id, hotel_changes in changes.items():
+        updates = {field: F(field) + delta for field, delta in hotel_changes.items() if delta}
+        if updates:
+            Hotel.objects.filter(pk=hotel_id).update(**updates)
+            # After commit, so no reader caches the old summary under the new stamp
+            transaction.on_commit(partial(invalidate_hotel_rating, hotel_id))
+
+
+def invalidate_hotel_rating(hotel_id):
+    """update() skips post_save, so expire the cached hotel and its hero section here"""
+    invalidate_hotel(hotel_id)
+    invalidate_sections(hotel_id, 'hero')
+
+
+def rebuild_ratings(hotels=None):
+    """
+    Recompute the rating summary of the given hotels (default: all) from
+    their reviews. Returns the number of hotels whose summary was wrong.
+    """
+    hotels = Hotel.objects.all() if hotels is None else hotels
+    hotels = list(hotels.only('id', 'rating', 'total_reviews', *[star_field(stars) for stars in STARS]))
+
+    summaries = {
+        row['hotel']: row
+        for row in HotelReview.objects.filter(hotel__in=[hotel.id for hotel in hotels])
+        .values('hotel')
+        .annotate(
+            review_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in STARS},
+        )
+    }
+
+    fields = ['rating', 'total_reviews', *[star_field(stars) for stars in STARS]]
+    stale = []
+    for hotel in hotels:
+        summary = summaries.get(hotel.id, {})
+        expected = {
+            'rating': summary.get('rating_sum') or 0,
+            'total_reviews': summary.get('review_count', 0),
+            **{star_field(stars): summary.get(f'stars_{stars}', 0) for stars in STARS},
+        }
+        if any(getattr(hotel, field) != value for field, value in expected.items()):
+            for field, value in expected.items():
+                setattr(hotel, field, value)
+            stale.append(hotel)
+
+    if stale:
+        Hotel.objects.bulk_update(stale, fields)
+        for hotel in stale:
+            invalidate_hotel_rating(hotel.id)
+    return len(stale)
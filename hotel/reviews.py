@@ -0,0 +1,86 @@
+"""
+Review feed
+Keyset pagination over a hotel's reviews: each page continues strictly
+after the sort key of the last review shown, carried in an opaque cursor,
+so page 500 reads as few rows as page 1. Every sort ends on id, which
+makes the key unique, and each sort is backed by an index on HotelReview.
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import HotelReview
+
+
+# Sort name -> descending key fields
+REVIEW_SORTS = {
+    'recent': ('created_at', 'id'),
+    'helpful': ('helpful_count', 'created_at', 'id'),
+}
+MAX_REVIEW_PAGE = 50
+
+
+def encode_cursor(review, fields):
+    key = [getattr(review, field) for field in fields]
+    raw = json.dumps([value.isoformat() if field == 'created_at' else value for field, value in zip(fields, key)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    """Sort key values from a cursor; raises ValueError if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    key = []
+    for field, value in zip(fields, values):
+        if field == 'created_at':
+            value = parse_datetime(value) if isinstance(value, str) else None
+        elif not isinstance(value, int) or isinstance(value, bool):
+            value = None
+        if value is None:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        key.append(value)
+    return key
+
+
+def after_key(fields, key):
+    """
+    Rows that come after key in descending (fields) order. The leading
+    range on the first field lets the database seek the index to the key.
+    """
+    condition = Q()
+    for i, field in enumerate(fields):
+        equal = {prev: key[j] for j, prev in enumerate(fields[:i])}
+        condition |= Q(**equal, **{f'{field}__lt': key[i]})
+    return Q(**{f'{fields[0]}__lte': key[0]}) & condition
+
+
+def review_page(hotel, sort='recent', rating=None, cursor=None, limit=10):
+    """
+    One page of the hotel's reviews. Returns (reviews, next_cursor);
+    next_cursor is None on the last page. Raises ValueError for an unknown
+    sort or a malformed cursor.
+    """
+    if sort not in REVIEW_SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+    fields = REVIEW_SORTS[sort]
+
+    reviews = HotelReview.objects.filter(hotel=hotel).select_related('user')
+    if rating is not None:
+        reviews = reviews.filter(rating=rating)
+    if cursor:
+        reviews = reviews.filter(after_key(fields, decode_cursor(cursor, fields)))
+
+    # One extra row tells whether another page exists
+    page = list(reviews.order_by(*[f'-{field}' for field in fields])[:limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1], fields)
+    return page, None
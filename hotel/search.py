@@ -0,0 +1,183 @@
+"""
+Flexible-date search
+Loads the room x date occupancy and nightly price grids once, then scores
+every candidate (room, check-in) window with prefix sums, so each window
+costs O(1) regardless of stay length and no per-room queries are issued.
+"""
+
+import heapq
+from collections import namedtuple
+from datetime import timedelta
+from itertools import accumulate
+
+from django.utils import timezone
+
+from booking.inventory import booked_nights, availability_matrix
+from .pricing import price_grid
+
+
+FlexibleStay = namedtuple('FlexibleStay', ['room', 'check_in', 'check_out', 'total', 'nightly_price'])
+
+
+def load_grids(rooms, start, end):
+    """
+    Occupancy and price grids for the nights in [start, end).
+    Returns (days, occupied, prices, min_stays) where occupied[room_id] is a
+    list of 0/1 flags, prices[room_id] the nightly rate and min_stays[room_id]
+    the minimum nights for an arrival, one entry per day.
+    """
+    days = [start + timedelta(days=i) for i in range((end - start).days)]
+    day_index = {day: i for i, day in enumerate(days)}
+
+    occupied = {room.id: [0] * len(days) for room in rooms}
+    nights = booked_nights(start, end, room_id__in=list(occupied)).values_list('room_id', 'date')
+    for room_id, night in nights:
+        occupied[room_id][day_index[night]] = 1
+
+    _, prices, min_stays = price_grid(rooms, start, end)
+    return days, occupied, prices, min_stays
+
+
+def flexible_search(rooms, check_in, nights, flex_days, limit=10):
+    """
+    Cheapest available stays of `nights` nights for check-in dates within
+    +/- flex_days of check_in, across the given rooms.
+    Returns up to `limit` FlexibleStay tuples, cheapest first; ties go to the
+    check-in closest to the requested one.
+    """
+    rooms = list(rooms)
+    earliest = max(check_in - timedelta(days=flex_days), timezone.now().date() + timedelta(days=1))
+    latest = check_in + timedelta(days=flex_days)
+    if not rooms or latest < earliest:
+        return []
+
+    days, occupied, prices, min_stays = load_grids(rooms, earliest, latest + timedelta(days=nights))
+    offsets = range((latest - earliest).days + 1)
+
+    candidates = []
+    for room in rooms:
+        # Prefix sums turn every window total into a single subtraction
+        blocked = [0] + list(accumulate(occupied[room.id]))
+        cost = [0] + list(accumulate(prices[room.id]))
+        for offset in offsets:
+            end = offset + nights
+            if blocked[end] - blocked[offset] or min_stays[room.id][offset] > nights:
+                continue
+            total = cost[end] - cost[offset]
+            stay_start = days[offset]
+            candidates.append((total, abs((stay_start - check_in).days), stay_start, room))
+
+    best = heapq.nsmallest(limit, candidates, key=lambda c: (c[0], c[1], c[2], c[3].room_number))
+
+    return [
+        FlexibleStay(
+            room=room,
+            check_in=stay_start,
+            check_out=stay_start + timedelta(days=nights),
+            total=total,
+            nightly_price=total / nights,
+        )
+        for total, _, stay_start, room in best
+    ]
+
+
+def _room_sort_key(room):
+    """Order rooms along a corridor: numeric room numbers first, then by text"""
+    number = room.room_number
+    return (0, int(number), number) if number.isdigit() else (1, 0, number)
+
+
+def _spread(window):
+    """How far apart the first and last room of a same-floor run are"""
+    first, last = _room_sort_key(window[0]), _room_sort_key(window[-1])
+    if first[0] == last[0] == 0:
+        return last[1] - first[1]
+    return len(window)
+
+
+def distribute_guests(capacities, guests):
+    """
+    Spread guests as evenly as the room capacities allow. Every room gets at
+    least one guest, so raises ValueError when there are fewer guests than rooms.
+    """
+    if guests < len(capacities):
+        raise ValueError(f"{guests} guests cannot fill {len(capacities)} rooms")
+    assigned = [0] * len(capacities)
+    remaining = guests
+    while remaining > 0:
+        open_rooms = [i for i, capacity in enumerate(capacities) if assigned[i] < capacity]
+        if not open_rooms:
+            break
+        share = max(1, remaining // len(open_rooms))
+        for i in open_rooms:
+            give = min(share, capacities[i] - assigned[i], remaining)
+            assigned[i] += give
+            remaining -= give
+            if remaining == 0:
+                break
+    return assigned
+
+
+def allocate_group(rooms, rooms_needed, guests):
+    """
+    Pick `rooms_needed` rooms whose combined max_guests covers `guests`.
+
+    Prefers a run of adjacent rooms on a single floor (smallest room-number
+    spread, then least spare capacity); falls back to filling whole floors in
+    order of free capacity, then to the largest rooms anywhere.
+    Returns a list of (room, guests) pairs, or None when no allocation exists,
+    including when there are fewer guests than rooms.
+    """
+    rooms = sorted(rooms, key=lambda room: (room.floor, _room_sort_key(room)))
+    if len(rooms) < rooms_needed or rooms_needed < 1 or guests < rooms_needed:
+        return None
+
+    def capacity(room):
+        return room.room_type.max_guests if room.room_type else 1
+
+    floors = {}
+    for room in rooms:
+        floors.setdefault(room.floor, []).append(room)
+
+    # 1. Adjacent rooms on one floor
+    best = None
+    for floor_rooms in floors.values():
+        for start in range(len(floor_rooms) - rooms_needed + 1):
+            window = floor_rooms[start:start + rooms_needed]
+            spare = sum(capacity(room) for room in window) - guests
+            if spare < 0:
+                continue
+            score = (_spread(window), spare)
+            if best is None or score < best[0]:
+                best = (score, window)
+    chosen = best[1] if best else None
+
+    # 2. Whole floors, most free capacity first
+    if chosen is None:
+        by_capacity = sorted(floors.values(), key=lambda fr: -sum(capacity(room) for room in fr))
+        picked = [room for floor_rooms in by_capacity for room in floor_rooms][:rooms_needed]
+        if sum(capacity(room) for room in picked) >= guests:
+            chosen = picked
+
+    # 3. Largest rooms anywhere
+    if chosen is None:
+        largest = sorted(rooms, key=lambda room: -capacity(room))[:rooms_needed]
+        if sum(capacity(room) for room in largest) < guests:
+            return None
+        chosen = sorted(largest, key=lambda room: (room.floor, _room_sort_key(room)))
+
+    return list(zip(chosen, distribute_guests([capacity(room) for room in chosen], guests)))
+
+
+def find_group_allocation(hotel, check_in, check_out, rooms_needed, guests):
+    """
+    Allocate rooms for a group from the precomputed room-night inventory:
+    one query for the bookable rooms, one for their availability.
+    """
+    rooms = list(
+        hotel.rooms.filter(status='available', is_active=True, room_type__isnull=False)
+        .select_related('room_type')
+    )
+    availability = availability_matrix([(check_in, check_out)], room_ids=[room.id for room in rooms])
+    free_rooms = [room for room in rooms if availability[room.id][0]]
+    return allocate_group(free_rooms, rooms_needed, guests)
@@ -0,0 +1,207 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from booking.models import Booking
+from booking.inventory import room_nights_changed
+from .models import Hotel, Room, RoomType, RoomRate, RoomImage, HotelFacility, HotelReview, Carousel, CarouselSlide
+from .calendars import invalidate_months, invalidate_rooms
+from .pricing import invalidate_rates
+from .defaults import invalidate_hotel
+from .fragments import invalidate_sections
+from .pagecache import invalidate_room_pages, invalidate_sitemap
+from .ratings import apply_rating_change
+from .images import schedule_derivatives
+
+
+@receiver(room_nights_changed)
+def invalidate_calendar_for_nights(sender, hotel_id, stays, **kwargs):
+    """
+    Signal handler to drop cached calendars for the months whose room nights changed.
+    """
+    for check_in, check_out in stays:
+        invalidate_months(hotel_id, check_in, check_out)
+
+
+@receiver(post_delete, sender=Booking)
+def invalidate_calendar_for_deleted_booking(sender, instance, **kwargs):
+    """
+    Signal handler for deleted bookings; their room nights go with them.
+    """
+    if instance.get_inventory_state() is not None:
+        invalidate_months(instance.hotel_id, instance.check_in_date, instance.check_out_date)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+@receiver(post_save, sender=RoomRate)
+@receiver(post_delete, sender=RoomRate)
+def invalidate_calendar_for_rooms(sender, instance, **kwargs):
+    """
+    Signal handler to drop every cached calendar of the hotel when rooms or rates change.
+    """
+    invalidate_rooms(instance.hotel_id)
+
+
+@receiver(post_save, sender=RoomRate)
+@receiver(post_delete, sender=RoomRate)
+def invalidate_quotes_for_rates(sender, instance, **kwargs):
+    """
+    Signal handler to expire cached quotes of the hotel when a rate changes.
+    """
+    invalidate_rates(instance.hotel_id)
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def invalidate_cached_hotel(sender, instance, **kwargs):
+    """
+    Signal handler to make every worker reload the hotel after it is saved.
+    """
+    invalidate_hotel(instance.id)
+
+
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+@receiver(post_save, sender=HotelFacility)
+@receiver(post_delete, sender=HotelFacility)
+def invalidate_cached_hotel_relations(sender, instance, **kwargs):
+    """
+    Signal handler for the room types and facilities cached with the hotel.
+    """
+    invalidate_hotel(instance.hotel_id)
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def invalidate_hero_fragment(sender, instance, **kwargs):
+    """
+    Signal handler for the home page sections that render hotel fields.
+    """
+    invalidate_sections(instance.id, 'hero')
+
+
+@receiver(post_save, sender=HotelFacility)
+@receiver(post_delete, sender=HotelFacility)
+def invalidate_facilities_fragment(sender, instance, **kwargs):
+    invalidate_sections(instance.hotel_id, 'facilities')
+
+
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+def invalidate_room_types_fragment(sender, instance, **kwargs):
+    invalidate_sections(instance.hotel_id, 'room_types')
+
+
+@receiver(post_save, sender=HotelReview)
+@receiver(post_delete, sender=HotelReview)
+def invalidate_reviews_fragment(sender, instance, **kwargs):
+    # Review saves and deletes run in a transaction; bump once it commits
+    transaction.on_commit(partial(invalidate_sections, instance.hotel_id, 'reviews'))
+
+
+@receiver(post_save, sender=User)
+def invalidate_reviews_fragment_for_user(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal handler for reviewer names shown in cached review lists.
+    Logins only touch last_login and are ignored.
+    """
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    hotel_ids = HotelReview.objects.filter(user=instance).values_list('hotel_id', flat=True).distinct()
+    for hotel_id in hotel_ids:
+        invalidate_sections(hotel_id, 'reviews')
+
+
+@receiver(post_save, sender=Carousel)
+@receiver(post_delete, sender=Carousel)
+def invalidate_carousel_fragment(sender, instance, **kwargs):
+    invalidate_sections(instance.hotel_id, 'carousel')
+
+
+@receiver(post_save, sender=CarouselSlide)
+@receiver(post_delete, sender=CarouselSlide)
+def invalidate_carousel_fragment_for_slide(sender, instance, **kwargs):
+    hotel_id = Carousel.objects.filter(id=instance.carousel_id).values_list('hotel_id', flat=True).first()
+    if hotel_id is not None:
+        invalidate_sections(hotel_id, 'carousel')
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def invalidate_pages_for_room(sender, instance, **kwargs):
+    """
+    Signal handler to purge cached public pages that show the hotel's rooms.
+    """
+    invalidate_room_pages(instance.hotel_id)
+
+
+@receiver(post_save, sender=RoomImage)
+@receiver(post_delete, sender=RoomImage)
+def invalidate_pages_for_room_image(sender, instance, **kwargs):
+    hotel_id = Room.objects.filter(id=instance.room_id).values_list('hotel_id', flat=True).first()
+    if hotel_id is not None:
+        invalidate_room_pages(hotel_id)
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def invalidate_sitemap_for_hotel(sender, instance, **kwargs):
+    invalidate_sitemap()
+
+
+@receiver(post_delete, sender=HotelReview)
+def update_rating_for_deleted_review(sender, instance, **kwargs):
+    """
+    Signal handler for deleted reviews, including cascades. Deletion runs in
+    a transaction, so the summary changes atomically with the review rows;
+    saves move the summary in HotelReview.save().
+    """
+    previous_state = getattr(instance, '_rating_state', None) or instance.get_rating_state()
+    apply_rating_change(previous_state, None)
+
+
+IMAGE_FIELDS = {
+    Hotel: ('image', 'banner'),
+    RoomType: ('image',),
+    RoomImage: ('image',),
+    CarouselSlide: ('image',),
+}
+
+
+def media_hotel_id(instance):
+    if isinstance(instance, Hotel):
+        return instance.id
+    if isinstance(instance, RoomImage):
+        return instance.room.hotel_id
+    if isinstance(instance, CarouselSlide):
+        return instance.carousel.hotel_id
+    return instance.hotel_id
+
+
+def invalidate_hotel_media(instance):
+    """Cached pages and fragments still point at the originals; purge them"""
+    hotel_id = media_hotel_id(instance)
+    invalidate_hotel(hotel_id)
+    invalidate_room_pages(hotel_id)
+    invalidate_sections(hotel_id, 'hero', 'carousel', 'room_types')
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_save, sender=RoomType)
+@receiver(post_save, sender=RoomImage)
+@receiver(post_save, sender=CarouselSlide)
+def generate_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal handler to render responsive copies of uploaded images after commit.
+    Saves that keep the stored images do no image work.
+    """
+    fields = [field for field in IMAGE_FIELDS[sender] if update_fields is None or field in update_fields]
+    schedule_derivatives(
+        instance.new_image_names(fields),
+        on_done=lambda: invalidate_hotel_media(instance),
+    )
@@ -0,0 +1,62 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from hotel.images import get_derivatives, prefetch_derivatives
+
+
+register = template.Library()
+
+
+def srcset(variants):
+    return ', '.join(f'{url} {width}w' for width, _, url in variants)
+
+
+@register.simple_tag
+def prefetch_images(objects, path):
+    """
+    Load the derivatives of every image at the dotted path on the objects
+    in one query, e.g. {% prefetch_images rooms "primary_image.image" %}
+    before a loop of responsive_image tags. Renders nothing.
+    """
+    names = []
+    for obj in objects:
+        for attr in path.split('.'):
+            obj = getattr(obj, attr, None)
+            if obj is None:
+                break
+        if obj:
+            names.append(obj.name)
+    prefetch_derivatives(names)
+    return ''
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', **attrs):
+    """
+    <picture> with WebP and JPEG srcsets and the intrinsic width and height
+    of an uploaded image; a plain <img> of the original until its
+    derivatives exist. Extra keyword arguments become <img> attributes.
+    """
+    if not image:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+
+    derivatives = get_derivatives(image.name)
+    jpeg = derivatives.get('jpeg')
+    if not jpeg:
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+
+    width, height, url = jpeg[-1]
+    img = format_html(
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"{}>',
+        url, srcset(jpeg), sizes, width, height, flatatt(attrs),
+    )
+    webp = derivatives.get('webp')
+    if not webp:
+        return img
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">{}</picture>',
+        srcset(webp), sizes, img,
+    )
@@ -0,0 +1,28 @@
+"""
+Helpers shared by the apps' tests
+"""
+
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+
+
+def jpeg_upload(name, size):
+    """An uploaded JPEG of the given (width, height)"""
+    buffer = BytesIO()
+    Image.new('RGB', size, 'navy').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+def use_temporary_media_root(test_case):
+    """Store the test's uploads in a fresh MEDIA_ROOT, removed after the test"""
+    media_root = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, media_root)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+    return media_root
@@ -1,3 +1,860 @@
-from django.test import TestCase
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from booking.inventory import reserve_room
+from booking.models import Booking
+from .models import (
+    Hotel, RoomType, Room, RoomImage, RoomRate, HotelFacility, HotelReview, ReviewHelpfulVote, Carousel,
+    CarouselSlide, ImageDerivative,
+)
+from .defaults import HotelCache, default_hotel_cache
+from .cache import LRUCache, bump_version
+from .pricing import cached_quote, quote_cache, quote_stay, rates_version_name
+from .calendars import get_month_calendar
+from .search import flexible_search
+from .views import MAX_AVAILABILITY_RANGES
+from .images import derivative_cache, missing_derivative_cache
+from .testing import jpeg_upload, use_temporary_media_root
+
+
+HOTEL_TABLES = ('"hotel_hotel"', '"hotel_roomtype"', '"hotel_hotelfacility"')
+
+
+def create_default_hotel():
+    hotel = Hotel.objects.create(
+        id=settings.DEFAULT_HOTEL_ID, name='Test Hotel', slug='test-hotel', description='Test',
+        email='hotel@example.com', phone='123', address='1 Street', city='Dhaka', state='Dhaka',
+        country='Bangladesh', postal_code='1000', image='hotels/test.jpg', banner='hotels/banners/test.jpg',
+    )
+    RoomType.objects.create(
+        hotel=hotel, name='Double', description='Double room', max_guests=2,
+        beds='Double bed', amenities='WiFi', image='room_types/test.jpg',
+    )
+    HotelFacility.objects.create(hotel=hotel, name='Pool', icon='swimming-pool')
+    return hotel
+
+
+def book_room(room, check_in, nights):
+    """A confirmed booking holding the room's nights from check_in"""
+    user, _ = User.objects.get_or_create(username='booker', defaults={'email': 'booker@example.com'})
+    return reserve_room(Booking(
+        user=user, room=room, hotel_id=room.hotel_id, check_in_date=check_in,
+        check_out_date=check_in + timedelta(days=nights), guest_name='Guest', guest_email='guest@example.com',
+        guest_phone='123', room_price_per_night=room.price_per_night, number_of_nights=nights,
+        subtotal=0, total_price=0, status='confirmed',
+    ))
+
+
+def hotel_queries(captured):
+    """Captured SQL statements that read the cached hotel tables"""
+    return [
+        query['sql'] for query in captured
+        if query['sql'].startswith('SELECT') and any(
+            f'FROM {table}' in query['sql'] for table in HOTEL_TABLES
+        )
+    ]
+
+
+class DefaultHotelCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        default_hotel_cache.clear()
+        self.hotel = create_default_hotel()
+
+    def test_warm_workers_do_not_query_the_hotel(self):
+        # Two workers: separate process-local caches sharing one cache backend
+        workers = [HotelCache(self.hotel.id), HotelCache(self.hotel.id)]
+        for worker in workers:
+            worker.get()
+
+        with CaptureQueriesContext(connection) as captured:
+            for worker in workers:
+                hotel = worker.get()
+                self.assertEqual([t.name for t in hotel.room_types.all()], ['Double'])
+                self.assertEqual([f.name for f in hotel.available_facilities], ['Pool'])
+        self.assertEqual(len(captured), 0)
+        self.assertEqual([worker.loads for worker in workers], [1, 1])
+
+    def test_hotel_change_refreshes_every_worker_once(self):
+        workers = [HotelCache(self.hotel.id), HotelCache(self.hotel.id)]
+        for worker in workers:
+            worker.get()
+
+        self.hotel.name = 'Renamed Hotel'
+        self.hotel.save()
+        HotelFacility.objects.create(hotel=self.hotel, name='Gym')
+
+        for worker in workers:
+            hotel = worker.get()
+            self.assertEqual(hotel.name, 'Renamed Hotel')
+            self.assertEqual(len(hotel.available_facilities), 2)
+            worker.get()
+        self.assertEqual([worker.loads for worker in workers], [2, 2])
+
+    def test_default_hotel_follows_the_setting(self):
+        other = Hotel.objects.create(
+            name='Other Hotel', slug='other-hotel', description='Other', email='other@example.com',
+            phone='456', address='2 Street', city='Dhaka', state='Dhaka', country='Bangladesh',
+            postal_code='1000', image='hotels/other.jpg', banner='hotels/banners/other.jpg',
+        )
+        self.assertEqual(default_hotel_cache.get().pk, self.hotel.pk)
+        with override_settings(DEFAULT_HOTEL_ID=other.pk):
+            self.assertEqual(default_hotel_cache.get().name, 'Other Hotel')
+        self.assertEqual(default_hotel_cache.get().pk, self.hotel.pk)
+
+    def test_requests_get_independent_copies(self):
+        first = default_hotel_cache.get()
+        first.name = 'Changed in one request'
+        self.assertEqual(default_hotel_cache.get().name, 'Test Hotel')
+
+    def test_warm_home_page_skips_hotel_queries(self):
+        self.client.get(reverse('hotel:home'))
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('hotel:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(hotel_queries(captured), [])
+
+
+class HotelPageQueryCountTest(TestCase):
+    """Home and hotel detail pages must not issue per-room or per-review queries"""
+    MAX_QUERIES = 12
+
+    def setUp(self):
+        cache.clear()
+        default_hotel_cache.clear()
+        self.hotel = create_default_hotel()
+        self.room_type = self.hotel.room_types.get()
+        self.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'pass12345')
+        self.client.force_login(self.viewer)
+
+    def add_rooms_and_reviews(self, count):
+        start = Room.objects.count()
+        for i in range(start, start + count):
+            room = Room.objects.create(
+                hotel=self.hotel, room_type=self.room_type, room_number=str(100 + i),
+                floor=1, price_per_night='100.00',
+            )
+            RoomImage.objects.create(room=room, image=f'rooms/{i}.jpg')
+            user = User.objects.create(username=f'guest{i}', email=f'guest{i}@example.com')
+            HotelReview.objects.create(
+                hotel=self.hotel, user=user, rating=4, title='Nice', comment='Nice stay',
+            )
+
+    def count_queries(self, url):
+        self.client.get(url)  # warm the default hotel cache
+        # but not the image derivatives, which are loaded per page, not per image
+        derivative_cache.clear()
+        missing_derivative_cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_query_count_does_not_grow_with_rooms_and_reviews(self):
+        for name in ('hotel:home', 'hotel:hotel_detail'):
+            with self.subTest(page=name):
+                url = reverse(name)
+                self.add_rooms_and_reviews(2)
+                few = self.count_queries(url)
+                self.add_rooms_and_reviews(10)
+                many = self.count_queries(url)
+
+                self.assertEqual(few, many)
+                self.assertLessEqual(many, self.MAX_QUERIES)
+
+    def test_room_page_query_count_is_fixed(self):
+        self.add_rooms_and_reviews(2)
+        room = Room.objects.order_by('id').first()
+        url = reverse('hotel:room_detail', args=[room.pk]) + (
+            '?check_in=2030-01-10&check_out=2030-01-12&range=2030-02-01:2030-02-03&range=2030-03-01:2030-03-05'
+        )
+        few = self.count_queries(url)
+        self.add_rooms_and_reviews(10)
+        many = self.count_queries(url)
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, self.MAX_QUERIES)
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['availability']), 3)
+        self.assertTrue(response.context['available'])
+        self.assertEqual(response.context['check_in'], '2030-01-10')
+
+
+class AvailabilityCalendarTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        default_hotel_cache.clear()
+        self.hotel = create_default_hotel()
+        room_type = self.hotel.room_types.get()
+        self.room, self.dearer_room = [
+            Room.objects.create(
+                hotel=self.hotel, room_type=room_type, room_number=number, floor=1, price_per_night=price,
+            )
+            for number, price in (('101', '100.00'), ('102', '120.00'))
+        ]
+
+    def days(self, *day_numbers):
+        """(free rooms, lowest price) of the given January 2030 days"""
+        days = get_month_calendar(self.hotel, 2030, 1)['room_types'][0]['days']
+        return [(days[day - 1]['available'], days[day - 1]['lowest_price']) for day in day_numbers]
+
+    def book(self, room, day, nights):
+        """Book from the given day counted from January 1, 2030"""
+        with self.captureOnCommitCallbacks(execute=True):
+            return book_room(room, date(2030, 1, 1) + timedelta(days=day - 1), nights)
+
+    def test_days_count_free_rooms_and_lowest_price(self):
+        self.book(self.room, 14, 2)
+        self.book(self.room, 20, 1)
+        self.book(self.dearer_room, 20, 1)
+        Room.objects.create(
+            hotel=self.hotel, room_type=self.room.room_type, room_number='103', floor=1,
+            price_per_night='50.00', status='maintenance',
+        )
+
+        self.assertEqual(self.days(13, 14, 15, 16, 20), [
+            (2, '100.00'), (1, '120.00'), (1, '120.00'), (2, '100.00'), (0, None),
+        ])
+
+    def test_month_is_rebuilt_after_a_booking_or_rate_in_it_changes(self):
+        self.assertEqual(self.days(14), [(2, '100.00')])
+        self.assertNumQueries(0, get_month_calendar, self.hotel, 2030, 1)
+
+        # Another month's booking leaves January cached
+        self.book(self.room, 40, 1)
+        self.assertNumQueries(0, get_month_calendar, self.hotel, 2030, 1)
+
+        self.book(self.room, 14, 1)
+        self.assertEqual(self.days(14), [(1, '120.00')])
+
+        RoomRate.objects.create(
+            room=self.dearer_room, name='Deal', price='90.00', start_date=date(2030, 1, 14), end_date=date(2030, 1, 14),
+        )
+        self.assertEqual(self.days(14), [(1, '90.00')])
+
+    def test_out_of_range_dates_are_rejected(self):
+        for year, month in ((0, 5), (9999, 12), (2030, 13)):
+            with self.subTest(year=year, month=month):
+                response = self.client.get(reverse('hotel:availability_calendar', args=[year, month]))
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+        response = self.client.get(reverse('hotel:availability_calendar', args=[9998, 11]))
+        self.assertEqual(response.status_code, 200)
+
+
+class AvailabilityApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        default_hotel_cache.clear()
+        self.hotel = create_default_hotel()
+        room_type = self.hotel.room_types.get()
+        self.rooms = [
+            Room.objects.create(
+                hotel=self.hotel, room_type=room_type, room_number=str(101 + i), floor=1, price_per_night='100.00',
+            )
+            for i in range(2)
+        ]
+        self.check_in = date(2030, 1, 14)
+        book_room(self.rooms[0], self.check_in, 2)
+
+    def get(self, **params):
+        return self.client.get(reverse('hotel:availability_api'), params)
+
+    def test_rooms_by_ranges(self):
+        data = self.get(range=['2030-01-12:2030-01-14', '2030-01-15:2030-01-17']).json()
+        self.assertEqual(data['availability'], {str(self.rooms[0].id): [True, False], str(self.rooms[1].id): [True, True]})
+        self.assertEqual(data['ranges'][1], {'check_in': '2030-01-15', 'check_out': '2030-01-17'})
+
+        data = self.get(range='2030-01-14:2030-01-15', room=self.rooms[1].id).json()
+        self.assertEqual(data['availability'], {str(self.rooms[1].id): [True]})
+
+    def test_bad_parameters_are_rejected(self):
+        too_many = ['2030-01-14:2030-01-15'] * (MAX_AVAILABILITY_RANGES + 1)
+        for params in (
+            {},
+            {'range': '2030-02-30:2030-03-02'},
+            {'range': '2030-01-14'},
+            {'range': '2030-01-14:2030-01-14'},
+            {'range': '2030-01-15:2030-01-14'},
+            {'range': '2030-01-14:2030-01-15', 'room': 'abc'},
+            {'range': too_many},
+        ):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class PricingTest(TestCase):
+    """Nightly prices come from the strongest matching rate"""
+
+    def setUp(self):
+        cache.clear()
+        self.hotel = create_default_hotel()
+        self.room_type = self.hotel.room_types.get()
+        self.room = Room.objects.create(
+            hotel=self.hotel, room_type=self.room_type, room_number='101', floor=1, price_per_night='100.00',
+        )
+        # A Monday, so weekday offsets are easy to read
+        self.monday = date(2030, 1, 7)
+
+    def rate(self, price, start, nights, **fields):
+        fields.setdefault('room_type', self.room_type)
+        return RoomRate.objects.create(
+            name='Rate', price=price, start_date=self.monday + timedelta(days=start),
+            end_date=self.monday + timedelta(days=start + nights - 1), **fields,
+        )
+
+    def nightly_prices(self, nights=4):
+        quote = quote_stay(self.room, self.monday, self.monday + timedelta(days=nights))
+        return [int(price) for price in quote.nightly_prices]
+
+    def test_overlapping_rates_resolve_by_level_then_priority(self):
+        self.rate('150.00', 0, 4)
+        self.rate('200.00', 1, 2, priority=5)
+        self.assertEqual(self.nightly_prices(), [150, 200, 200, 150])
+
+        # A room's own rate beats any room type rate
+        self.rate('120.00', 2, 2, room=self.room, room_type=None)
+        self.assertEqual(self.nightly_prices(), [150, 200, 120, 120])
+
+    def test_weekday_rates_apply_only_on_their_days(self):
+        self.rate('300.00', 0, 14, weekdays='5,6')
+        self.assertEqual(self.nightly_prices(7), [100, 100, 100, 100, 100, 300, 300])
+
+    def test_min_stay_rejects_short_stays(self):
+        from booking.forms import BookingForm
+
+        self.rate('150.00', 0, 1, min_stay=3)
+        self.assertFalse(quote_stay(self.room, self.monday, self.monday + timedelta(days=2)).meets_min_stay)
+        self.assertTrue(quote_stay(self.room, self.monday + timedelta(days=1), self.monday + timedelta(days=3)).meets_min_stay)
+
+        form = BookingForm(room=self.room, data={
+            'check_in_date': self.monday, 'check_out_date': self.monday + timedelta(days=2),
+            'number_of_guests': 1, 'guest_name': 'Guest', 'guest_email': 'guest@example.com', 'guest_phone': '123',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('at least 3 nights', str(form.non_field_errors()))
+
+    def test_tax_uses_current_setting(self):
+        with override_settings(BOOKING_TAX_RATE='0.15'):
+            quote = quote_stay(self.room, self.monday, self.monday + timedelta(days=3))
+        self.assertEqual((quote.subtotal, quote.tax, quote.total), (Decimal('300.00'), Decimal('45.00'), Decimal('345.00')))
+
+
+class FlexibleSearchTest(TestCase):
+    """Flexible-date windows are scored by total price, then distance from the asked date"""
+
+    def setUp(self):
+        cache.clear()
+        self.hotel = create_default_hotel()
+        room_type = self.hotel.room_types.get()
+        self.room, self.dearer_room = [
+            Room.objects.create(
+                hotel=self.hotel, room_type=room_type, room_number=number, floor=1, price_per_night=price,
+            )
+            for number, price in (('101', '100.00'), ('102', '120.00'))
+        ]
+        self.check_in = date(2030, 1, 14)
+
+    def day(self, offset):
+        return self.check_in + timedelta(days=offset)
+
+    def stays(self, rooms, nights, flex_days, check_in=None):
+        return [
+            (stay.room.room_number, stay.check_in, int(stay.total))
+            for stay in flexible_search(rooms, check_in or self.check_in, nights, flex_days)
+        ]
+
+    def test_windows_with_a_blocked_night_are_skipped(self):
+        book_room(self.room, self.check_in, 1)
+        self.assertEqual(self.stays([self.room], 2, 1), [('101', self.day(1), 200)])
+
+    def test_arrivals_under_their_min_stay_are_skipped(self):
+        RoomRate.objects.create(
+            room=self.room, name='Event', price='100.00', start_date=self.check_in, end_date=self.check_in, min_stay=3,
+        )
+        self.assertEqual([stay[1] for stay in self.stays([self.room], 2, 1)], [self.day(-1), self.day(1)])
+        self.assertEqual([stay[1] for stay in self.stays([self.room], 3, 0)], [self.check_in])
+
+    def test_check_ins_start_tomorrow_at_the_earliest(self):
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        self.assertEqual(min(stay[1] for stay in self.stays([self.room], 1, 3, check_in=tomorrow)), tomorrow)
+        self.assertEqual(self.stays([self.room], 1, 2, check_in=tomorrow - timedelta(days=5)), [])
+
+    def test_cheapest_first_then_closest_to_the_asked_date(self):
+        RoomRate.objects.create(
+            room=self.room, name='Deal', price='90.00', start_date=self.day(-1), end_date=self.day(-1),
+        )
+        self.assertEqual(self.stays([self.room, self.dearer_room], 1, 1), [
+            ('101', self.day(-1), 90),
+            ('101', self.check_in, 100),
+            ('101', self.day(1), 100),
+            ('102', self.check_in, 120),
+            ('102', self.day(-1), 120),
+            ('102', self.day(1), 120),
+        ])
+
+
+class LRUCacheTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+    def test_entries_expire_after_ttl(self):
+        lru = LRUCache(ttl=10)
+        with mock.patch('hotel.cache.time.monotonic', return_value=100):
+            lru.set('a', 1)
+        with mock.patch('hotel.cache.time.monotonic', return_value=109):
+            self.assertEqual(lru.get('a'), 1)
+        with mock.patch('hotel.cache.time.monotonic', return_value=110):
+            self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.stats()['size'], 0)
+
+
+class QuoteCacheTest(TestCase):
+    """Booking form quotes are memoized until prices or rates change"""
+
+    def setUp(self):
+        cache.clear()
+        quote_cache.clear()
+        self.addCleanup(quote_cache.clear)
+        self.hotel = create_default_hotel()
+        self.room = Room.objects.create(
+            hotel=self.hotel, room_type=self.hotel.room_types.get(), room_number='101', floor=1,
+            price_per_night='100.00',
+        )
+        self.check_in, self.check_out = date(2030, 1, 7), date(2030, 1, 9)
+
+    def test_hits_and_misses_are_counted_and_exposed(self):
+        cached_quote(self.room, self.check_in, self.check_out)
+        with self.assertNumQueries(0):
+            cached_quote(self.room, self.check_in, self.check_out)
+
+        staff = User.objects.create_user('desk', 'desk@example.com', 'pass12345', is_staff=True)
+        self.client.force_login(staff)
+        stats = self.client.get(reverse('booking:quote_cache_stats')).json()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size'], stats['hit_rate']), (1, 1, 1, 0.5))
+
+    def test_rate_version_bump_requotes(self):
+        self.assertEqual(cached_quote(self.room, self.check_in, self.check_out).subtotal, Decimal('200.00'))
+
+        # Saving a rate bumps the version through its signal
+        rate = RoomRate.objects.create(
+            room=self.room, name='Peak', price='150.00', start_date=self.check_in, end_date=self.check_out,
+        )
+        self.assertEqual(cached_quote(self.room, self.check_in, self.check_out).subtotal, Decimal('300.00'))
+
+        # update() skips the signal, so the cached quote survives until the version is bumped
+        RoomRate.objects.filter(pk=rate.pk).update(price='180.00')
+        self.assertEqual(cached_quote(self.room, self.check_in, self.check_out).subtotal, Decimal('300.00'))
+
+        bump_version(rates_version_name(self.hotel.id))
+        self.assertEqual(cached_quote(self.room, self.check_in, self.check_out).subtotal, Decimal('360.00'))
+
+
+class HomeFragmentCacheTest(TestCase):
+    """Home page sections are rendered once per version of their data"""
+
+    def setUp(self):
+        cache.clear()
+        default_hotel_cache.clear()
+        self.hotel = create_default_hotel()
+        self.guest = User.objects.create(username='guest', email='guest@example.com', first_name='Ada')
+        HotelReview.objects.create(hotel=self.hotel, user=self.guest, rating=5, title='Great', comment='Great stay')
+        carousel = Carousel.objects.create(hotel=self.hotel)
+        CarouselSlide.objects.create(carousel=carousel, title='Welcome', image='carousel/welcome.jpg')
+
+    def get_home(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('hotel:home'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), [query['sql'] for query in captured]
+
+    def test_warm_page_skips_section_queries(self):
+        self.get_home()
+        content, queries = self.get_home()
+
+        self.assertIn('Welcome', content)
+        self.assertIn('Ada', content)
+        for table in ('"hotel_hotelreview"', '"hotel_carouselslide"'):
+            self.assertFalse([sql for sql in queries if f'FROM {table}' in sql], table)
+
+    def test_changes_are_rendered_on_the_next_request(self):
+        self.get_home()
+
+        other = User.objects.create(username='other', email='other@example.com', first_name='Grace')
+        HotelReview.objects.create(hotel=self.hotel, user=other, rating=4, title='Good', comment='Good stay')
+        slide = CarouselSlide.objects.get()
+        slide.title = 'Summer offer'
+        slide.save()
+        HotelFacility.objects.create(hotel=self.hotel, name='Spa')
+        self.guest.first_name = 'Augusta'
+        self.guest.save()
+
+        content, _ = self.get_home()
+        for text in ('Grace', 'Augusta', 'Summer offer', 'Spa'):
+            self.assertIn(text, content)
+
+
+class PublicPageCacheTest(TestCase):
+    """Anonymous responses are served from the page cache until their data changes"""
+
+    def setUp(self):
+        cache.clear()
+        default_hotel_cache.clear()
+        self.hotel = create_default_hotel()
+        self.room = Room.objects.create(
+            hotel=self.hotel, room_type=self.hotel.room_types.get(), room_number='101',
+            floor=1, price_per_night='100.00',
+        )
+
+    def get(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous_pages_are_cached(self):
+        urls = [
+            reverse('hotel:home'), reverse('hotel:hotel_detail'),
+            reverse('hotel:room_detail', args=[self.room.pk]), '/sitemap.xml',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url)['X-Page-Cache'], 'miss')
+                self.assertEqual(self.get(url)['X-Page-Cache'], 'hit')
+        self.assertEqual(self.get('/sitemap.xml')['Content-Type'], 'application/xml')
+
+    def test_logged_in_users_are_not_cached(self):
+        user = User.objects.create_user('viewer', 'viewer@example.com', 'pass12345')
+        self.client.force_login(user)
+        self.get(reverse('hotel:home'))
+        self.assertNotIn('X-Page-Cache', self.get(reverse('hotel:home')))
+
+    def test_cached_forms_get_a_fresh_csrf_token(self):
+        self.get(reverse('hotel:home'))
+
+        client = Client(enforce_csrf_checks=True)
+        response = self.get(reverse('hotel:home'), client)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()).group(1)
+        self.assertIn('csrftoken', response.cookies)
+
+        response = client.post(reverse('hotel:search_availability'), {'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_requests_get_not_modified(self):
+        urls = [reverse('hotel:hotel_detail'), reverse('hotel:room_detail', args=[self.room.pk]), '/sitemap.xml']
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.get(url)
+                with CaptureQueriesContext(connection) as captured:
+                    by_etag = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'], HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                    )
+                self.assertEqual(by_etag.status_code, 304)
+                self.assertLessEqual(len(captured), 1)
+
+        etag = self.get(urls[0])['ETag']
+        guest = User.objects.create(username='guest', email='guest@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            HotelReview.objects.create(hotel=self.hotel, user=guest, rating=5, title='Great', comment='Great stay')
+        self.assertEqual(self.client.get(urls[0], HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_modified_since_alone_is_not_trusted(self):
+        # A change within the same second keeps Last-Modified, so the date alone never validates
+        url = reverse('hotel:hotel_detail')
+        last_modified = self.get(url)['Last-Modified']
+        guest = User.objects.create(username='guest', email='guest@example.com')
+        HotelReview.objects.create(hotel=self.hotel, user=guest, rating=5, title='Great', comment='Great stay')
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_changes_purge_the_pages_that_show_them(self):
+        detail = reverse('hotel:hotel_detail')
+        room_url = reverse('hotel:room_detail', args=[self.room.pk])
+        for url in (detail, room_url, '/sitemap.xml'):
+            self.get(url)
+
+        guest = User.objects.create(username='guest', email='guest@example.com', first_name='Ada')
+        with self.captureOnCommitCallbacks(execute=True):
+            HotelReview.objects.create(hotel=self.hotel, user=guest, rating=5, title='Great', comment='Great stay')
+        self.assertContains(self.get(detail), 'Ada')
+
+        self.room.status = 'maintenance'
+        self.room.save()
+        response = self.get(room_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Not Available')
+
+        Room.objects.create(
+            hotel=self.hotel, room_type=self.room.room_type, room_number='102',
+            floor=1, price_per_night='100.00',
+        )
+        self.assertContains(self.get('/sitemap.xml'), reverse('hotel:room_detail', args=[self.room.pk + 1]))
+
+
+class RatingSummaryTest(TestCase):
+    """Hotel rating count, sum and histogram follow review changes"""
+
+    def setUp(self):
+        cache.clear()
+        default_hotel_cache.clear()
+        self.hotel = create_default_hotel()
+        self.users = [
+            User.objects.create(username=f'guest{i}', email=f'guest{i}@example.com') for i in range(3)
+        ]
+
+    def review(self, user, rating):
+        return HotelReview.objects.create(hotel=self.hotel, user=user, rating=rating, title='Stay', comment='Stay')
+
+    def summary(self):
+        hotel = Hotel.objects.get(pk=self.hotel.pk)
+        return hotel.total_reviews, hotel.rating, [count for _, count, _ in hotel.get_rating_histogram()]
+
+    def test_create_edit_and_delete_move_the_summary(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 3)
+        self.assertEqual(self.summary(), (2, 8, [1, 0, 1, 0, 0]))
+
+        first = HotelReview.objects.get(pk=first.pk)
+        first.rating = 2
+        first.save()
+        first.save()
+        self.assertEqual(self.summary(), (2, 5, [0, 0, 1, 1, 0]))
+
+        first.delete()
+        self.assertEqual(self.summary(), (1, 3, [0, 0, 1, 0, 0]))
+        self.assertEqual(Hotel.objects.get(pk=self.hotel.pk).get_average_rating(), 3)
+
+    def test_review_page_submission_updates_home_page_rating(self):
+        self.client.get(reverse('hotel:home'))
+        self.client.force_login(self.users[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('hotel:review_create'), {'rating': 4, 'title': 'Good', 'comment': 'Good stay'})
+        self.client.logout()
+
+        self.assertContains(self.client.get(reverse('hotel:home')), '4.0/5 (1 reviews)')
+
+    def test_hotel_saves_keep_the_summary(self):
+        stale = Hotel.objects.get(pk=self.hotel.pk)
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 3)
+
+        stale.name = 'Renamed Hotel'
+        stale.save()
+        self.assertEqual(self.summary(), (2, 8, [1, 0, 1, 0, 0]))
+        self.assertEqual(Hotel.objects.get(pk=self.hotel.pk).name, 'Renamed Hotel')
+
+    def test_review_row_rolls_back_with_a_failed_summary_update(self):
+        review = self.review(self.users[0], 5)
+        review.rating = 1
+        with mock.patch('hotel.ratings.apply_rating_change', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                review.save()
+        self.assertEqual(HotelReview.objects.get(pk=review.pk).rating, 5)
+        self.assertEqual(self.summary(), (1, 5, [1, 0, 0, 0, 0]))
+
+    def test_rebuild_repairs_drifted_summaries(self):
+        for user, rating in zip(self.users, (5, 4, 4)):
+            self.review(user, rating)
+        Hotel.objects.filter(pk=self.hotel.pk).update(total_reviews=0, rating=0, rating_4=7)
+
+        call_command('rebuild_hotel_ratings', stdout=StringIO())
+        self.assertEqual(self.summary(), (3, 13, [1, 2, 0, 0, 0]))
+
+
+class ReviewFeedTest(TestCase):
+    """Keyset-paginated review feed"""
+
+    def setUp(self):
+        cache.clear()
+        default_hotel_cache.clear()
+        self.hotel = create_default_hotel()
+        for i in range(25):
+            user = User.objects.create(username=f'guest{i}', email=f'guest{i}@example.com')
+            HotelReview.objects.create(
+                hotel=self.hotel, user=user, rating=i % 5 + 1, title=f'Review {i}', comment='Stay',
+                helpful_count=i % 3,
+            )
+        # Shared timestamps force the id tie-breaker to keep pages disjoint
+        reviews = list(HotelReview.objects.order_by('id'))
+        for i, review in enumerate(reviews):
+            HotelReview.objects.filter(pk=review.pk).update(created_at=reviews[i // 4 * 4].created_at)
+        default_hotel_cache.get()
+
+    def read_feed(self, **params):
+        ids, cursor, query_counts = [], None, []
+        while True:
+            if cursor:
+                params['cursor'] = cursor
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse('hotel:reviews_api'), {'limit': 10, **params})
+            self.assertEqual(response.status_code, 200)
+            query_counts.append(len(captured))
+            data = response.json()
+            ids += [review['id'] for review in data['reviews']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids, query_counts
+
+    def test_pages_follow_the_sort_order(self):
+        expected = {
+            'recent': HotelReview.objects.order_by('-created_at', '-id'),
+            'helpful': HotelReview.objects.order_by('-helpful_count', '-created_at', '-id'),
+        }
+        for sort, reviews in expected.items():
+            with self.subTest(sort=sort):
+                ids, query_counts = self.read_feed(sort=sort)
+                self.assertEqual(ids, list(reviews.values_list('id', flat=True)))
+                self.assertEqual(len(query_counts), 3)
+                self.assertEqual(len(set(query_counts)), 1)
+
+    def test_rating_filter(self):
+        ids, _ = self.read_feed(rating=4)
+        self.assertEqual(
+            ids, list(HotelReview.objects.filter(rating=4).order_by('-created_at', '-id').values_list('id', flat=True))
+        )
+
+    def test_invalid_parameters(self):
+        for params in ({'cursor': 'not-a-cursor'}, {'sort': 'oldest'}, {'rating': 6}, {'limit': 0}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('hotel:reviews_api'), params)
+                self.assertEqual(response.status_code, 400)
+
+
+class HelpfulVoteTest(TestCase):
+    """Helpful votes are deduplicated per user and counted in batches"""
+
+    def setUp(self):
+        cache.clear()
+        default_hotel_cache.clear()
+        self.hotel = create_default_hotel()
+        author = User.objects.create(username='author', email='author@example.com')
+        self.review = HotelReview.objects.create(hotel=self.hotel, user=author, rating=5, title='Great', comment='Great')
+        self.voters = [User.objects.create(username=f'voter{i}', email=f'voter{i}@example.com') for i in range(3)]
+
+    def vote(self, user):
+        self.client.force_login(user)
+        return self.client.post(reverse('hotel:review_helpful', args=[self.review.pk]))
+
+    def test_votes_are_buffered_and_deduplicated(self):
+        self.assertEqual(self.vote(self.voters[0]).status_code, 201)
+        response = self.vote(self.voters[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'review': self.review.pk, 'created': False, 'helpful_count': 1})
+        self.vote(self.voters[1])
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 0)
+
+        call_command('flush_helpful_votes', batch_size=1, stdout=StringIO())
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 2)
+        self.assertFalse(ReviewHelpfulVote.objects.filter(counted=False).exists())
+
+        self.vote(self.voters[2])
+        call_command('flush_helpful_votes', stdout=StringIO())
+        call_command('flush_helpful_votes', stdout=StringIO())
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 3)
+
+    def test_anonymous_votes_are_rejected(self):
+        response = self.client.post(reverse('hotel:review_helpful', args=[self.review.pk]))
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False, IMAGE_DERIVATIVE_WIDTHS=(320, 640))
+class ImageDerivativeTest(TestCase):
+    """Uploads get resized WebP/JPEG copies and responsive markup"""
+
+    def setUp(self):
+        use_temporary_media_root(self)
+
+        cache.clear()
+        derivative_cache.clear()
+        missing_derivative_cache.clear()
+        self.hotel = create_default_hotel()
+        self.room = Room.objects.create(
+            hotel=self.hotel, room_type=self.hotel.room_types.get(), room_number='101',
+            floor=1, price_per_night='100.00',
+        )
+
+    def upload(self, size):
+        with self.captureOnCommitCallbacks(execute=True):
+            return RoomImage.objects.create(room=self.room, image=jpeg_upload('view.jpg', size))
+
+    def render(self, image):
+        return Template('{% load responsive_images %}{% responsive_image image alt="View" %}').render(
+            Context({'image': image.image})
+        )
+
+    def test_upload_generates_derivatives_and_srcset(self):
+        image = self.upload((1000, 500))
+
+        derivatives = ImageDerivative.objects.filter(source=image.image.name)
+        self.assertEqual(
+            sorted(derivatives.values_list('format', 'width', 'height')),
+            [('jpeg', 320, 160), ('jpeg', 640, 320), ('webp', 320, 160), ('webp', 640, 320)],
+        )
+        html = self.render(image)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('-320w.jpg 320w', html)
+        self.assertIn('width="640" height="320"', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_small_images_are_not_upscaled(self):
+        image = self.upload((200, 100))
+        self.assertEqual(
+            list(ImageDerivative.objects.filter(source=image.image.name, format='jpeg').values_list('width', 'height')),
+            [(200, 100)],
+        )
+
+    def test_original_is_served_until_derivatives_exist(self):
+        image = RoomImage.objects.create(room=self.room, image=jpeg_upload('view.jpg', (1000, 500)))
+        self.assertEqual(self.render(image), f'<img src="{image.image.url}" alt="View" decoding="async" loading="lazy">')
+
+    def test_saves_without_a_new_image_do_no_image_work(self):
+        image = self.upload((400, 200))
+
+        image = RoomImage.objects.get(pk=image.pk)
+        image.alt_text = 'Sea view'
+        with self.captureOnCommitCallbacks() as callbacks:
+            image.save()
+            image.save()
+        self.assertEqual(callbacks, [])
+
+        image.image = jpeg_upload('garden.jpg', (400, 200))
+        with self.captureOnCommitCallbacks() as callbacks:
+            image.save()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_prefetch_loads_a_list_of_images_in_one_query(self):
+        images = [self.upload((400, 200)) for _ in range(3)]
+        derivative_cache.clear()
+        template = Template(
+            '{% load responsive_images %}{% prefetch_images images "image" %}'
+            '{% for image in images %}{% responsive_image image.image %}{% endfor %}'
+        )
+        with self.assertNumQueries(1):
+            html = template.render(Context({'images': images}))
+        self.assertEqual(html.count('<picture>'), 3)
@@ -14,10 +14,15 @@ urlpatterns = [
     
     # Reviews
     path('hotel/review/', views.HotelReviewCreateView.as_view(), name='review_create'),
+    path('api/reviews/', views.reviews_api, name='reviews_api'),
+    path('hotel/review/<int:pk>/helpful/', views.review_helpful, name='review_helpful'),
     
     # Wishlist
     path('saved-hotels/', views.saved_hotels, name='saved_hotels'),
     
     # Search
     path('search-availability/', views.search_availability, name='search_availability'),
+    path('api/availability/', views.availability_api, name='availability_api'),
+    path('api/group-search/', views.group_search_api, name='group_search_api'),
+    path('api/calendar/<int:year>/<int:month>/', views.availability_calendar, name='availability_calendar'),
 ]
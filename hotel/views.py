@@ -1,22 +1,36 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import JsonResponse
 from django.views.generic import ListView, DetailView, CreateView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q, Avg
+from django.db.models import Q
 from django.utils import timezone
 from django.contrib import messages
 from django.conf import settings
-from datetime import timedelta
+from datetime import MAXYEAR, MINYEAR, timedelta
 from django.core.paginator import Paginator
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_POST
 
-from .models import Hotel, Room, RoomType, HotelReview, HotelFacility, RoomImage
-from .forms import HotelSearchForm, HotelReviewForm, HotelFilterForm, RoomFilterForm
+from .models import Hotel, Room, RoomType, HotelReview, HotelFacility, RoomImage, CarouselSlide, room_images_prefetch
+from .forms import HotelSearchForm, GroupSearchForm, HotelReviewForm, HotelFilterForm, RoomFilterForm
+from .calendars import get_month_calendar
+from .defaults import get_default_hotel
+from .fragments import section_versions
+from .pagecache import cache_public_page, home_page_versions, hotel_page_versions, room_page_versions
+from .search import flexible_search, find_group_allocation
+from .pricing import quote_rooms
+from .reviews import review_page, MAX_REVIEW_PAGE
+from .votes import record_helpful_vote, pending_vote_count
 from booking.models import Booking
+from booking.inventory import availability_matrix, parse_range, requested_ranges
 from users.models import SavedHotel
 
 
-def get_default_hotel():
-    """Get the default hotel for this single-hotel setup"""
-    return get_object_or_404(Hotel, id=settings.DEFAULT_HOTEL_ID)
+# Upper bound on date windows per availability API request
+MAX_AVAILABILITY_RANGES = 120
+
+# Upper bound on date windows checked on a room page
+MAX_ROOM_PAGE_RANGES = 12
 
 
 class SEOContextMixin:
@@ -39,6 +53,7 @@ class SEOContextMixin:
         return context
 
 
+@method_decorator(cache_public_page(home_page_versions), name='dispatch')
 class HomeView(SEOContextMixin, TemplateView):
     """Home page for single hotel"""
     template_name = 'hotel/home.html'
@@ -58,9 +73,9 @@ class HomeView(SEOContextMixin, TemplateView):
         
         context['hotel'] = hotel
         context['room_types'] = hotel.room_types.all()
-        context['facilities'] = hotel.facilities.filter(is_available=True)
-        context['reviews'] = hotel.reviews.all()[:10]
-        context['average_rating'] = hotel.reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+        context['facilities'] = hotel.available_facilities
+        context['reviews'] = hotel.reviews.select_related('user')[:10]
+        context['average_rating'] = hotel.get_average_rating()
         context['search_form'] = HotelSearchForm()
         
         # Check if user has saved this hotel
@@ -73,17 +88,17 @@ class HomeView(SEOContextMixin, TemplateView):
             context['is_saved'] = False
         
         # Available rooms
-        rooms = hotel.rooms.filter(status='available', is_active=True)
+        rooms = hotel.rooms.filter(status='available', is_active=True).select_related('room_type')
         context['rooms'] = rooms[:6]
         
-        # Carousel
-        try:
-            carousel = hotel.carousel
-            if carousel.is_active:
-                context['carousel'] = carousel
-                context['carousel_slides'] = carousel.get_active_slides()
-        except:
-            pass
+        # Carousel slides stay lazy: the query only runs when the fragment is rebuilt
+        context['carousel_slides'] = CarouselSlide.objects.filter(
+            carousel__hotel=hotel, carousel__is_active=True, is_active=True
+        ).order_by('order')
+        
+        # Cached template fragments vary on these version stamps
+        context['fragments'] = section_versions(hotel.id)
+        context['fragment_timeout'] = settings.FRAGMENT_CACHE_TIMEOUT
         
         return context
 
@@ -98,6 +113,7 @@ class HotelListView(TemplateView):
 
 
 
+@method_decorator(cache_public_page(hotel_page_versions), name='dispatch')
 class HotelDetailView(SEOContextMixin, TemplateView):
     """Detailed hotel view for single hotel"""
     template_name = 'hotel/hotel_detail.html'
@@ -117,9 +133,10 @@ class HotelDetailView(SEOContextMixin, TemplateView):
         
         context['hotel'] = hotel
         context['room_types'] = hotel.room_types.all()
-        context['facilities'] = hotel.facilities.filter(is_available=True)
-        context['reviews'] = hotel.reviews.all()[:10]
-        context['average_rating'] = hotel.reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+        context['facilities'] = hotel.available_facilities
+        context['reviews'] = hotel.reviews.select_related('user')[:10]
+        context['average_rating'] = hotel.get_average_rating()
+        context['rating_histogram'] = hotel.get_rating_histogram()
         
         # Check if user has saved this hotel
         if self.request.user.is_authenticated:
@@ -130,7 +147,9 @@ class HotelDetailView(SEOContextMixin, TemplateView):
         
         # Room filter
         room_type_id = self.request.GET.get('room_type')
-        rooms = hotel.rooms.filter(status='available', is_active=True)
+        rooms = hotel.rooms.filter(status='available', is_active=True).select_related('room_type').prefetch_related(
+            room_images_prefetch()
+        )
         
         if room_type_id:
             rooms = rooms.filter(room_type_id=room_type_id)
@@ -140,15 +159,19 @@ class HotelDetailView(SEOContextMixin, TemplateView):
         return context
 
 
+@method_decorator(cache_public_page(room_page_versions), name='dispatch')
 class RoomDetailView(SEOContextMixin, DetailView):
     """Detailed room view"""
     model = Room
     template_name = 'hotel/room_detail.html'
     context_object_name = 'room'
     
+    def get_queryset(self):
+        return Room.objects.select_related('hotel', 'room_type').prefetch_related(room_images_prefetch())
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        room = self.get_object()
+        room = self.object
         
         # Set SEO data
         self.seo_data = self.get_seo_context(
@@ -159,16 +182,27 @@ class RoomDetailView(SEOContextMixin, DetailView):
         )
         context.update(self.seo_data)
         
-        context['images'] = room.images.all()
+        context['images'] = room.gallery
         context['hotel'] = room.hotel
         context['room_type'] = room.room_type
+        context['related_rooms'] = room.hotel.rooms.select_related('room_type').prefetch_related(
+            room_images_prefetch()
+        ).order_by('id')
         
-        # Check availability for date range
-        check_in = self.request.GET.get('check_in')
-        check_out = self.request.GET.get('check_out')
-        
-        if check_in and check_out:
-            context['available'] = room.is_available(check_in, check_out)
+        # Availability for check_in/check_out and any extra ranges, in one query
+        try:
+            ranges = requested_ranges(self.request.GET, MAX_ROOM_PAGE_RANGES)
+        except ValueError:
+            ranges = []
+        if ranges:
+            flags = availability_matrix(ranges, room_ids=[room.id])[room.id]
+            context['availability'] = [
+                {'check_in': check_in, 'check_out': check_out, 'available': available}
+                for (check_in, check_out), available in zip(ranges, flags)
+            ]
+            if self.request.GET.get('check_in') and self.request.GET.get('check_out'):
+                context['check_in'], context['check_out'] = (value.isoformat() for value in ranges[0])
+                context['available'] = flags[0]
         
         return context
 
@@ -192,14 +226,9 @@ class HotelReviewCreateView(LoginRequiredMixin, CreateView):
             messages.error(self.request, 'You have already reviewed this hotel.')
             return redirect('hotel:hotel_detail')
         
+        # The hotel's rating summary is updated by the review signals
         review.save()
         
-        # Update hotel rating
-        avg_rating = self.hotel.reviews.aggregate(Avg('rating'))['rating__avg']
-        self.hotel.rating = avg_rating * self.hotel.reviews.count()
-        self.hotel.total_reviews = self.hotel.reviews.count()
-        self.hotel.save()
-        
         messages.success(self.request, 'Review submitted successfully!')
         return redirect('hotel:hotel_detail')
     
@@ -258,24 +287,37 @@ def search_availability(request):
             check_in = form.cleaned_data.get('check_in_date')
             check_out = form.cleaned_data.get('check_out_date')
             guests = form.cleaned_data.get('guests', 1)
+            flexible_days = form.cleaned_data.get('flexible_days') or 0
             
             # Get available rooms for the date range
-            # Filter rooms that don't have conflicting bookings
-            from booking.models import Booking
-            
-            booked_rooms = Booking.objects.filter(
-                hotel=hotel,
-                status__in=['confirmed', 'checked_in']
-            ).filter(
-                check_in_date__lt=check_out,
-                check_out_date__gt=check_in
-            ).values_list('room_id', flat=True)
-            
-            available_rooms = hotel.rooms.filter(
+            candidates = list(hotel.rooms.filter(
                 status='available',
                 is_active=True,
                 room_type__max_guests__gte=guests
-            ).exclude(id__in=booked_rooms)
+            ).select_related('room_type'))
+            
+            # Flexible dates: cheapest stays of the same length around the requested week
+            if flexible_days:
+                nights = (check_out - check_in).days
+                return render(request, 'hotel/search_results.html', {
+                    'hotel': hotel,
+                    'flexible_stays': flexible_search(candidates, check_in, nights, flexible_days),
+                    'flexible_days': flexible_days,
+                    'nights': nights,
+                    'check_in': check_in,
+                    'check_out': check_out,
+                    'guests': guests,
+                })
+            
+            availability = availability_matrix(
+                [(check_in, check_out)], room_ids=[room.id for room in candidates]
+            )
+            available_rooms = [room for room in candidates if availability[room.id][0]]
+            
+            # One rate query prices the stay in every listed room
+            quotes = quote_rooms(available_rooms, check_in, check_out)
+            for room in available_rooms:
+                room.quote = quotes[room.id]
             
             return render(request, 'hotel/search_results.html', {
                 'hotel': hotel,
@@ -287,3 +329,149 @@ def search_availability(request):
     
     return render(request, 'hotel/search_form.html', {'form': form})
 
+
+def availability_api(request):
+    """
+    Availability matrix for many rooms x many date ranges.
+    GET ?range=YYYY-MM-DD:YYYY-MM-DD (repeatable) [&room=<id> (repeatable)]
+    Without room ids every room of the hotel is resolved.
+    """
+    hotel = get_default_hotel()
+    
+    raw_ranges = request.GET.getlist('range')
+    if not raw_ranges:
+        return JsonResponse({'error': 'At least one range is required.'}, status=400)
+    if len(raw_ranges) > MAX_AVAILABILITY_RANGES:
+        return JsonResponse(
+            {'error': f'At most {MAX_AVAILABILITY_RANGES} ranges per request.'}, status=400
+        )
+    
+    try:
+        date_ranges = [parse_range(raw) for raw in raw_ranges]
+        room_ids = [int(room_id) for room_id in request.GET.getlist('room')]
+    except ValueError:
+        return JsonResponse({'error': 'Invalid range or room parameter.'}, status=400)
+    
+    rooms = hotel.rooms.filter(is_active=True)
+    if room_ids:
+        rooms = rooms.filter(id__in=room_ids)
+    
+    matrix = availability_matrix(date_ranges, room_ids=rooms.values_list('id', flat=True))
+    
+    return JsonResponse({
+        'hotel': hotel.id,
+        'ranges': [
+            {'check_in': check_in.isoformat(), 'check_out': check_out.isoformat()}
+            for check_in, check_out in date_ranges
+        ],
+        'availability': {str(room_id): flags for room_id, flags in matrix.items()},
+    })
+
+
+def reviews_api(request):
+    """
+    Review feed of the hotel, newest or most helpful first.
+    GET [?sort=recent|helpful] [&rating=1-5] [&limit=N] [&cursor=<next_cursor>]
+    """
+    hotel = get_default_hotel()
+    
+    try:
+        rating = request.GET.get('rating')
+        rating = int(rating) if rating else None
+        if rating is not None and not 1 <= rating <= 5:
+            raise ValueError(rating)
+        limit = min(int(request.GET.get('limit', 10)), MAX_REVIEW_PAGE)
+        if limit < 1:
+            raise ValueError(limit)
+        reviews, next_cursor = review_page(
+            hotel,
+            sort=request.GET.get('sort', 'recent'),
+            rating=rating,
+            cursor=request.GET.get('cursor'),
+            limit=limit,
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Invalid sort, rating, limit or cursor parameter.'}, status=400)
+    
+    return JsonResponse({
+        'hotel': hotel.id,
+        'reviews': [
+            {
+                'id': review.id,
+                'rating': review.rating,
+                'title': review.title,
+                'comment': review.comment,
+                'author': review.user.get_full_name() or review.user.username,
+                'verified_guest': review.verified_guest,
+                'helpful_count': review.helpful_count,
+                'created_at': review.created_at.isoformat(),
+            }
+            for review in reviews
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+@require_POST
+def review_helpful(request, pk):
+    """Mark a review as helpful, once per user; helpful_count catches up on the next flush"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Please login to vote.'}, status=401)
+    
+    review = get_object_or_404(HotelReview.objects.only('id', 'helpful_count'), pk=pk)
+    created = record_helpful_vote(review, request.user)
+    
+    return JsonResponse({
+        'review': review.id,
+        'created': created,
+        'helpful_count': review.helpful_count + pending_vote_count(review),
+    }, status=201 if created else 200)
+
+
+def availability_calendar(request, year, month):
+    """Per-day availability and lowest price for each room type, one month at a time"""
+    hotel = get_default_hotel()
+    
+    if not MINYEAR <= year < MAXYEAR:
+        return JsonResponse({'error': f'Year must be between {MINYEAR} and {MAXYEAR - 1}.'}, status=400)
+    if not 1 <= month <= 12:
+        return JsonResponse({'error': 'Month must be between 1 and 12.'}, status=400)
+    
+    return JsonResponse(get_month_calendar(hotel, year, month))
+
+
+def group_search_api(request):
+    """
+    Allocate several rooms for one group.
+    GET ?check_in_date=...&check_out_date=...&rooms=<count>&guests=<count>
+    """
+    hotel = get_default_hotel()
+    form = GroupSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    
+    check_in = form.cleaned_data['check_in_date']
+    check_out = form.cleaned_data['check_out_date']
+    guests = form.cleaned_data['guests']
+    
+    allocation = find_group_allocation(hotel, check_in, check_out, form.cleaned_data['rooms'], guests)
+    if allocation is None:
+        return JsonResponse({'available': False, 'rooms': []})
+    
+    return JsonResponse({
+        'available': True,
+        'check_in': check_in.isoformat(),
+        'check_out': check_out.isoformat(),
+        'guests': guests,
+        'rooms': [
+            {
+                'id': room.id,
+                'room_number': room.room_number,
+                'floor': room.floor,
+                'room_type': room.room_type.name,
+                'max_guests': room.room_type.max_guests,
+                'guests': room_guests,
+            }
+            for room, room_guests in allocation
+        ],
+    })
@@ -0,0 +1,69 @@
+"""
+Helpful votes
+A vote is one INSERT into ReviewHelpfulVote; the unique (review, user)
+constraint deduplicates it and no review row is locked. flush_helpful_votes()
+later adds the pending votes to HotelReview.helpful_count with one F()
+update per review and marks them counted in the same transaction, so a
+hot review takes a single row lock per flush instead of one per click.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import HotelReview, ReviewHelpfulVote
+
+
+FLUSH_BATCH_SIZE = 5000
+
+
+def record_helpful_vote(review, user):
+    """Store the user's vote; returns False if they had already voted"""
+    try:
+        with transaction.atomic():
+            ReviewHelpfulVote.objects.create(review=review, user=user)
+    except IntegrityError:
+        return False
+    return True
+
+
+def pending_vote_count(review):
+    """Votes on the review not yet added to its helpful_count"""
+    return ReviewHelpfulVote.objects.filter(review=review, counted=False).count()
+
+
+def flush_batch(batch_size):
+    """Count one batch of pending votes; returns (votes, reviews) flushed"""
+    with transaction.atomic():
+        # skip_locked lets concurrent flushers take disjoint batches
+        vote_ids = list(
+            ReviewHelpfulVote.objects.select_for_update(skip_locked=True)
+            .filter(counted=False)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not vote_ids:
+            return 0, 0
+
+        per_review = (
+            ReviewHelpfulVote.objects.filter(id__in=vote_ids)
+            .values('review')
+            .annotate(votes=Count('id'))
+            .order_by('review')
+        )
+        reviews = 0
+        for row in per_review:
+            HotelReview.objects.filter(pk=row['review']).update(helpful_count=F('helpful_count') + row['votes'])
+            reviews += 1
+        ReviewHelpfulVote.objects.filter(id__in=vote_ids).update(counted=True)
+    return len(vote_ids), reviews
+
+
+def flush_helpful_votes(batch_size=FLUSH_BATCH_SIZE):
+    """Add every pending vote to its review's helpful_count; returns (votes, reviews)"""
+    total_votes = total_reviews = 0
+    while True:
+        votes, reviews = flush_batch(batch_size)
+        if not votes:
+            return total_votes, total_reviews
+        total_votes += votes
+        total_reviews += reviews
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -95,6 +96,35 @@ DATABASES = {
 }
 
 
+# Cache
+# Version stamps used for cache invalidation must be visible to every worker,
+# so point this at a shared backend (Redis, Memcached) when running several processes.
+# Version stamps purge cached data in every worker, so all processes must
+# share this cache: Redis (REDIS_URL, needs redis) or Memcached
+# (MEMCACHED_LOCATION, needs pymemcache) when configured, else files on disk
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -154,6 +184,31 @@ LOGOUT_REDIRECT_URL = 'hotel:home'
 # Set the ID of the hotel to use throughout the application
 DEFAULT_HOTEL_ID = 1  # Change this to your hotel's ID
 
+# Minutes a pending booking holds its room nights while the guest pays
+BOOKING_HOLD_MINUTES = 15
+
+# Tax charged on room prices
+BOOKING_TAX_RATE = '0.10'
+
+# Per-process memo of booking form price quotes
+QUOTE_CACHE_SIZE = 10000
+QUOTE_CACHE_TIMEOUT = 60 * 10
+
+# Home page template fragments are invalidated by version stamps; the
+# timeout only lets entries of old versions age out of the cache
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Anonymous full-page cache; purged through version stamps like fragments
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Responsive image derivatives, generated in background threads after upload
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_DERIVATIVE_WORKERS = 2
+IMAGE_DERIVATIVES_ASYNC = True
+
+# Profile pictures only need avatar-sized thumbnails (100px and 150px, at 1x and 2x)
+PROFILE_PICTURE_WIDTHS = (100, 150, 200, 300)
+
 # Email settings (Configure as needed)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
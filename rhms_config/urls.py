@@ -20,10 +20,11 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.sitemaps.views import sitemap
 from hotel.sitemaps import sitemaps
+from hotel.pagecache import cache_public_page, sitemap_versions
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', cache_public_page(sitemap_versions)(sitemap), {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
     path('', include('hotel.urls', namespace='hotel')),
     path('booking/', include('booking.urls', namespace='booking')),
     path('users/', include('users.urls', namespace='users')),
@@ -0,0 +1,65 @@
+"""
+Management command to measure the database work of a login.
+A login loads the user and saves last_login. This times that path with the
+current User signal handlers ("after") and with the old handler that also
+re-saved the profile on every User save ("before"), inside a transaction
+that is rolled back.
+Usage: python manage.py benchmark_login [--logins N]
+"""
+
+import time
+
+from django.contrib.auth.models import User, update_last_login
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+
+
+LEGACY_HANDLER_UID = 'benchmark_login_legacy_profile_save'
+
+
+def legacy_save_user_profile(sender, instance, **kwargs):
+    """The User post_save handler before profile writes became change-driven"""
+    instance.profile.save()
+
+
+class Command(BaseCommand):
+    help = 'Compare login throughput with and without the legacy profile save on every User save'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=1000, help='Logins per run (default: 1000)')
+
+    def handle(self, *args, **options):
+        logins = max(1, options['logins'])
+
+        with transaction.atomic():
+            user = User.objects.create_user(username='benchmark-login')
+            results = [
+                ('before', self.measure(user.pk, logins, legacy=True)),
+                ('after', self.measure(user.pk, logins)),
+            ]
+            transaction.set_rollback(True)
+
+        for label, (seconds, queries) in results:
+            self.stdout.write(
+                f'  {label:>6}: {logins / seconds:,.0f} logins/s, '
+                f'{seconds / logins * 1000:.3f} ms and {queries / logins:.1f} queries per login'
+            )
+        (_, (before, _)), (_, (after, _)) = results
+        self.stdout.write(self.style.SUCCESS(f'✓ Logins are {before / after:.1f}x faster without the profile save'))
+
+    def measure(self, user_id, logins, legacy=False):
+        """(seconds, queries) for the given number of logins"""
+        if legacy:
+            post_save.connect(legacy_save_user_profile, sender=User, dispatch_uid=LEGACY_HANDLER_UID)
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(logins):
+                    # Each login request loads its own User instance
+                    update_last_login(None, User.objects.get(pk=user_id))
+                seconds = time.perf_counter() - start
+        finally:
+            post_save.disconnect(sender=User, dispatch_uid=LEGACY_HANDLER_UID)
+        return seconds, len(queries)
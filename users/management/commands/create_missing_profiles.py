@@ -1,29 +1,49 @@
+"""
+Management command to create missing user profiles and notification preferences.
+Users without them are found with an anti-join and backfilled in bulk_create
+batches, walking the user table by id.
+Usage: python manage.py create_missing_profiles [--batch-size N] [--dry-run]
+"""
+
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from users.models import UserProfile
+from users.models import UserProfile, NotificationPreference
+from users.profiles import BACKFILL_BATCH_SIZE, backfill_batch, users_missing
+
+
+BACKFILL_MODELS = (
+    ('profiles', UserProfile),
+    ('notification preferences', NotificationPreference),
+)
 
 
 class Command(BaseCommand):
-    help = 'Create missing user profiles for existing users'
+    help = 'Create missing user profiles and notification preferences for existing users'
 
-    def handle(self, *args, **options):
-        """Create profiles for all users that don't have one"""
-        
-        created_count = 0
-        existing_count = 0
-        
-        for user in User.objects.all():
-            profile, created = UserProfile.objects.get_or_create(user=user)
-            if created:
-                created_count += 1
-                self.stdout.write(f'Created profile for user: {user.username}')
-            else:
-                existing_count += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'\nProfile creation complete!\n'
-                f'  - Created: {created_count} new profiles\n'
-                f'  - Already existed: {existing_count} profiles'
-            )
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BACKFILL_BATCH_SIZE,
+            help=f'Users per INSERT (default: {BACKFILL_BATCH_SIZE})',
         )
+        parser.add_argument('--dry-run', action='store_true', help='Only count the missing rows')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+
+        for label, model in BACKFILL_MODELS:
+            missing = users_missing(model).count()
+            if options['dry_run'] or not missing:
+                self.stdout.write(f'{missing} users are missing {label}')
+                continue
+
+            created = 0
+            last_id = 0
+            while True:
+                count, last_id = backfill_batch(model, last_id, batch_size)
+                if not count:
+                    break
+                created += count
+                self.stdout.write(f'  {label}: {created}/{missing} (up to user {last_id})')
+            self.stdout.write(self.style.SUCCESS(f'✓ Created {label} for {created} users'))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('✓ Dry run complete, nothing was written'))
@@ -1,8 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import URLValidator
-from PIL import Image
-import os
 
 class UserProfile(models.Model):
     """Extended user profile"""
@@ -38,15 +36,13 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        # Resize image if it exists
-        if self.profile_picture:
-            img = Image.open(self.profile_picture.path)
-            if img.height > 300 or img.width > 300:
-                img.thumbnail((300, 300))
-                img.save(self.profile_picture.path)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored picture so thumbnails are only made for a new upload
+        if 'profile_picture' not in instance.get_deferred_fields():
+            instance._picture_name = instance.profile_picture.name
+        return instance
 
 
 class SavedHotel(models.Model):
@@ -0,0 +1,63 @@
+"""
+Profile access
+A profile is inserted together with its user by a post_save signal, and
+nothing else about saving a User touches it. Users created without the
+signal (raw fixture loads, imports) get their profile on first use from
+get_profile(), with a single INSERT. backfill_batch() inserts the missing
+profiles and notification preferences of many users at once.
+"""
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import UserProfile
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def get_profile(user):
+    """The user's profile, created if it is missing"""
+    try:
+        return user.profile
+    except UserProfile.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            profile = UserProfile.objects.create(user=user)
+    except IntegrityError:
+        # Another request created it first
+        profile = UserProfile.objects.get(user=user)
+    user.profile = profile
+    return profile
+
+
+def add_bookings(user, count=1):
+    """Add to the profile's total_bookings with one atomic UPDATE, not a read-modify-write"""
+    profiles = UserProfile.objects.filter(user=user)
+    if not profiles.update(total_bookings=F('total_bookings') + count):
+        get_profile(user)
+        profiles.update(total_bookings=F('total_bookings') + count)
+
+
+def users_missing(model):
+    """Users without a row of the per-user model, found with an anti-join"""
+    related = model._meta.get_field('user').related_query_name()
+    return User.objects.filter(**{f'{related}__isnull': True})
+
+
+def backfill_batch(model, after=0, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Insert default rows for the next batch of users (by id, after the given
+    one) that lack them. Returns (users in the batch, last user id), or
+    (0, None) when no user is left.
+    """
+    user_ids = list(
+        users_missing(model).filter(id__gt=after).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not user_ids:
+        return 0, None
+    # ignore_conflicts: rows created concurrently by signups or get_profile()
+    model.objects.bulk_create([model(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+    return len(user_ids), user_ids[-1]
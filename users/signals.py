@@ -1,26 +1,32 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.conf import settings
 from django.contrib.auth.models import User
+from hotel.images import schedule_derivatives
 from .models import UserProfile
 
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
     """
     Signal handler to create a UserProfile whenever a new User is created.
+    Later User saves (logins, password changes) leave the profile alone;
+    users without one get it lazily from users.profiles.get_profile().
     """
-    if created:
-        UserProfile.objects.get_or_create(user=instance)
+    if created and not raw:
+        UserProfile.objects.create(user=instance)
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+@receiver(post_save, sender=UserProfile)
+def generate_profile_thumbnails(sender, instance, update_fields=None, **kwargs):
     """
-    Signal handler to save UserProfile whenever User is saved.
-    Ensures profile exists for all users.
+    Signal handler to render thumbnails of a newly uploaded profile picture
+    in a background worker. Saves that keep the stored picture do no image work.
     """
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
-    else:
-        # Create profile if it doesn't exist
-        UserProfile.objects.get_or_create(user=instance)
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return
+    name = instance.profile_picture.name or None
+    if name == (getattr(instance, '_picture_name', None) or None):
+        return
+    instance._picture_name = name
+    schedule_derivatives([name], widths=settings.PROFILE_PICTURE_WIDTHS)
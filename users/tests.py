@@ -1,3 +1,121 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User, update_last_login
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from PIL import Image
+from hotel.models import ImageDerivative
+from hotel.testing import jpeg_upload, use_temporary_media_root
+
+from .models import UserProfile, NotificationPreference
+from .profiles import get_profile
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False, PROFILE_PICTURE_WIDTHS=(100, 300))
+class ProfilePictureTest(TestCase):
+    """Profile pictures get thumbnails once per upload, never on unrelated saves"""
+
+    def setUp(self):
+        use_temporary_media_root(self)
+
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'secret')
+
+    def upload_picture(self, size):
+        profile = UserProfile.objects.get(user=self.user)
+        profile.profile_picture = jpeg_upload('me.jpg', size)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        return profile
+
+    def test_new_picture_gets_thumbnails_and_original_is_kept(self):
+        profile = self.upload_picture((1200, 1200))
+
+        self.assertEqual(
+            sorted(ImageDerivative.objects.filter(source=profile.profile_picture.name).values_list('format', 'width')),
+            [('jpeg', 100), ('jpeg', 300), ('webp', 100), ('webp', 300)],
+        )
+        with Image.open(profile.profile_picture.path) as original:
+            self.assertEqual(original.size, (1200, 1200))
+
+    def test_saves_without_a_new_picture_do_no_image_work(self):
+        self.upload_picture((400, 400))
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.city = 'Dhaka'
+        with self.captureOnCommitCallbacks() as callbacks:
+            profile.save()
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+
+
+class ProfileWriteTest(TestCase):
+    """User saves leave the profile alone; missing profiles appear on first use"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'secret', first_name='Ana', last_name='Khan')
+
+    def test_signup_creates_profile(self):
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
+
+    def test_login_only_updates_last_login(self):
+        user = User.objects.get(pk=self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            update_last_login(None, user)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('users_userprofile', queries[0]['sql'])
+
+    def test_missing_profile_is_created_with_one_insert(self):
+        UserProfile.objects.filter(user=self.user).delete()
+        user = User.objects.get(pk=self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            profile = get_profile(user)
+        self.assertEqual(profile.user_id, user.pk)
+        self.assertEqual([query['sql'].split()[0] for query in queries if 'userprofile' in query['sql']], ['SELECT', 'INSERT'])
+        self.assertNumQueries(0, get_profile, user)
+
+    def test_unchanged_profile_form_writes_nothing(self):
+        self.client.login(username='guest', password='secret')
+        data = {'email': 'guest@example.com', 'first_name': 'Ana', 'last_name': 'Khan', 'gender': ''}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('users:profile'), data)
+        self.assertRedirects(response, reverse('users:profile'))
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "users_userprofile"')])
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "auth_user"')])
+
+        data['city'] = 'Dhaka'
+        data['last_name'] = 'Rahman'
+        self.client.post(reverse('users:profile'), data)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_name, 'Rahman')
+        self.assertEqual(UserProfile.objects.get(user=self.user).city, 'Dhaka')
+
+
+class CreateMissingProfilesTest(TestCase):
+    """The backfill inserts missing per-user rows in batches"""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f'guest{i}') for i in range(5)]
+        UserProfile.objects.filter(user__in=self.users[:3]).delete()
+
+    def test_dry_run_writes_nothing(self):
+        out = StringIO()
+        call_command('create_missing_profiles', '--dry-run', stdout=out)
+        self.assertIn('3 users are missing profiles', out.getvalue())
+        self.assertIn('5 users are missing notification preferences', out.getvalue())
+        self.assertEqual(UserProfile.objects.count(), 2)
+        self.assertFalse(NotificationPreference.objects.exists())
+
+    def test_backfill_in_batches(self):
+        # Per model: a count, then one SELECT and INSERT per batch and a final empty SELECT
+        with self.assertNumQueries((1 + 2 * 2 + 1) + (1 + 3 * 2 + 1)):
+            call_command('create_missing_profiles', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(UserProfile.objects.filter(user__in=self.users).count(), 5)
+        self.assertEqual(NotificationPreference.objects.filter(user__in=self.users).count(), 5)
+
+        out = StringIO()
+        call_command('create_missing_profiles', stdout=out)
+        self.assertIn('0 users are missing profiles', out.getvalue())
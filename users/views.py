@@ -1,16 +1,18 @@
 from django.shortcuts import render, redirect
+from django.http import HttpResponseRedirect
 from django.views.generic import CreateView, UpdateView
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.utils import timezone
 
 from .forms import (UserRegistrationForm, UserLoginForm, UserProfileForm, 
                    ChangePasswordForm, NotificationPreferenceForm)
 from .models import UserProfile, NotificationPreference
+from .profiles import get_profile
 from booking.models import Booking
+from booking.stats import get_booking_stats
 
 
 class UserRegistrationView(CreateView):
@@ -23,9 +25,7 @@ class UserRegistrationView(CreateView):
         response = super().form_valid(form)
         user = self.object
         
-        # Create user profile
-        UserProfile.objects.get_or_create(user=user)
-        
+        # The profile was created by the post_save signal
         # Create notification preferences
         NotificationPreference.objects.get_or_create(user=user)
         
@@ -56,7 +56,7 @@ class UserProfileView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('users:profile')
     
     def get_object(self):
-        return self.request.user.profile
+        return get_profile(self.request.user)
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -64,17 +64,23 @@ class UserProfileView(LoginRequiredMixin, UpdateView):
         return kwargs
     
     def form_valid(self, form):
-        profile = form.save()
+        # Write the profile and the user only if the form changed their fields
+        if any(name in form._meta.fields for name in form.changed_data):
+            form.save()
         
         # Update user info
         user = self.request.user
-        user.email = form.cleaned_data['email']
-        user.first_name = form.cleaned_data['first_name']
-        user.last_name = form.cleaned_data['last_name']
-        user.save()
+        user_fields = [
+            name for name in ('email', 'first_name', 'last_name')
+            if getattr(user, name) != form.cleaned_data[name]
+        ]
+        for name in user_fields:
+            setattr(user, name, form.cleaned_data[name])
+        if user_fields:
+            user.save(update_fields=user_fields)
         
         messages.success(self.request, 'Profile updated successfully!')
-        return super().form_valid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
 
 def dashboard(request):
@@ -82,20 +88,14 @@ def dashboard(request):
     if not request.user.is_authenticated:
         return redirect('users:login')
     
-    profile = request.user.profile
+    profile = get_profile(request.user)
     recent_bookings = Booking.objects.filter(user=request.user).order_by('-created_at')[:5]
+    booking_stats = get_booking_stats(request.user)
     stats = {
-        'total_bookings': profile.total_bookings,
+        'total_bookings': booking_stats['total'],
         'loyalty_points': profile.loyalty_points,
-        'upcoming_bookings': Booking.objects.filter(
-            user=request.user,
-            status__in=['pending', 'confirmed'],
-            check_in_date__gte=timezone.now().date()
-        ).count(),
-        'completed_bookings': Booking.objects.filter(
-            user=request.user,
-            status='checked_out'
-        ).count(),
+        'upcoming_bookings': booking_stats['upcoming'],
+        'completed_bookings': booking_stats['checked_out'],
     }
     
     return render(request, 'users/dashboard.html', {
@@ -155,5 +155,5 @@ def user_account(request):
     
     return render(request, 'users/account.html', {
         'user': request.user,
-        'profile': request.user.profile
+        'profile': get_profile(request.user)
     })